@@ -0,0 +1,69 @@
+"""Report the memory held per track when the CSV catalogue is loaded into the domain model.
+
+The domain classes use __slots__. For the "before" figure the same catalogue is built from copies of the classes
+without __slots__, whose instances keep their attributes in a __dict__, as the classes did before. (Subclasses that
+merely leave out __slots__ would not do: the attributes set by the inherited methods would still go into the parent's
+slots, leaving the __dict__ empty.)
+
+Run from the project root with:  python -m benchmarks.memory_per_track
+"""
+
+import gc
+import tracemalloc
+import types
+
+from utils import get_project_root
+from music.adapters import csvdatareader
+from music.adapters.csvdatareader import TrackCSVReader
+from music.domainmodel import track, artist, album, genre
+
+DATA_PATH = get_project_root() / 'music' / 'adapters' / 'data'
+
+DOMAIN_CLASSES = [track.Track, artist.Artist, album.Album, genre.Genre]
+# Modules whose globals name the domain classes: the reader constructs the entities, and Track's setters check the
+# types of its artist, album and genres.
+MODULES = [csvdatareader, track]
+
+
+def measure_catalogue() -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    reader = TrackCSVReader()
+    reader.read_catalogue(DATA_PATH)
+    gc.collect()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return allocated, len(reader.dataset_of_tracks)
+
+
+def without_slots(domain_class) -> type:
+    """ A copy of domain_class with the same methods, whose instances keep their attributes in a __dict__. """
+    namespace = {key: value for key, value in vars(domain_class).items()
+                 if key != '__slots__' and not isinstance(value, types.MemberDescriptorType)}
+    return type(domain_class.__name__, domain_class.__bases__, namespace)
+
+
+def measure_with_dict_instances() -> tuple:
+    # Swap in the dict-backed copies wherever the domain classes are looked up while the catalogue is built.
+    copies = {domain_class.__name__: without_slots(domain_class) for domain_class in DOMAIN_CLASSES}
+    originals = [(module, name, getattr(module, name)) for module in MODULES for name in copies]
+    for module, name, _ in originals:
+        setattr(module, name, copies[name])
+    try:
+        return measure_catalogue()
+    finally:
+        for module, name, domain_class in originals:
+            setattr(module, name, domain_class)
+
+
+def main():
+    before, number_of_tracks = measure_with_dict_instances()
+    after, _ = measure_catalogue()
+    print(f'tracks loaded:                    {number_of_tracks}')
+    print(f'bytes per track with __dict__:    {before / number_of_tracks:,.0f}')
+    print(f'bytes per track with __slots__:   {after / number_of_tracks:,.0f}')
+    print(f'saving:                           {(before - after) / before:.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,40 @@ class Config:
 
     REPOSITORY = environ.get('REPOSITORY')
 
+    # Cache the parsed CSV catalogue in a binary snapshot next to the CSV files, to speed up later start-ups.
+    snapshot_string = environ.get('CATALOGUE_SNAPSHOT', 'False')
+    CATALOGUE_SNAPSHOT = False
+    if snapshot_string.lower().strip() == "true":
+        CATALOGUE_SNAPSHOT = True
+
+    # Number of worker processes used to parse the tracks CSV file; 1 parses it in the application process.
+    CSV_READER_PROCESSES = int(environ.get('CSV_READER_PROCESSES', '1'))
+
+    # Rendered pages of the read-only views kept by the response cache, and seconds until each must be rendered again.
+    RESPONSE_CACHE_SIZE = int(environ.get('RESPONSE_CACHE_SIZE', '256'))
+    RESPONSE_CACHE_TTL = float(environ.get('RESPONSE_CACHE_TTL', '300'))
+
+    # Commit reviews from a background thread in batches, rather than in the request adding each one (database
+    # repository only). A batch holds up to REVIEW_BATCH_SIZE reviews.
+    write_behind_string = environ.get('REVIEW_WRITE_BEHIND', 'False')
+    REVIEW_WRITE_BEHIND = False
+    if write_behind_string.lower().strip() == "true":
+        REVIEW_WRITE_BEHIND = True
+    REVIEW_BATCH_SIZE = int(environ.get('REVIEW_BATCH_SIZE', '100'))
+
+    # Passwords are hashed and checked by PASSWORD_HASH_WORKERS threads, with up to PASSWORD_HASH_QUEUE more waiting
+    # for them before logins are turned away. New hashes use PASSWORD_HASH_ITERATIONS rounds of PBKDF2-SHA256.
+    PASSWORD_HASH_WORKERS = int(environ.get('PASSWORD_HASH_WORKERS', '2'))
+    PASSWORD_HASH_QUEUE = int(environ.get('PASSWORD_HASH_QUEUE', '16'))
+    PASSWORD_HASH_ITERATIONS = int(environ.get('PASSWORD_HASH_ITERATIONS', '260000'))
+
+    # Cache shared by the services layer: 'local' for one in each process, or 'sqlite' for one shared through the
+    # SQLite file CACHE_PATH by all processes. Holds up to CACHE_SIZE values, each for CACHE_TTL seconds.
+    CACHE_BACKEND = environ.get('CACHE_BACKEND', 'local')
+    CACHE_PATH = environ.get('CACHE_PATH', 'music-cache.db')
+    CACHE_SIZE = int(environ.get('CACHE_SIZE', '4096'))
+    CACHE_TTL = float(environ.get('CACHE_TTL', '300'))
+
     # Database configuration
     SQLALCHEMY_DATABASE_URI = environ.get('SQLALCHEMY_DATABASE_URI')
 
@@ -27,3 +61,16 @@ class Config:
     if echo_string.lower().strip() == "true":
         SQLALCHEMY_ECHO = True
 
+    # Connection pool: a class name from sqlalchemy.pool, e.g. 'QueuePool' or 'NullPool' (a new connection for every
+    # checkout). Size and overflow only apply to QueuePool; a recycle time of -1 keeps connections indefinitely.
+    SQLALCHEMY_POOL_CLASS = environ.get('SQLALCHEMY_POOL_CLASS', 'NullPool')
+    SQLALCHEMY_POOL_SIZE = int(environ.get('SQLALCHEMY_POOL_SIZE', '5'))
+    SQLALCHEMY_MAX_OVERFLOW = int(environ.get('SQLALCHEMY_MAX_OVERFLOW', '10'))
+    SQLALCHEMY_POOL_RECYCLE = int(environ.get('SQLALCHEMY_POOL_RECYCLE', '-1'))
+
+    # Open SQLite database files in WAL mode with synchronous=NORMAL, so that readers don't wait for writers.
+    wal_string = environ.get('SQLITE_WAL', 'False')
+    SQLITE_WAL = False
+    if wal_string.lower().strip() == "true":
+        SQLITE_WAL = True
+
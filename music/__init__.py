@@ -1,21 +1,24 @@
 """Initialize Flask app."""
 
 from pathlib import Path
+import atexit
 import os
 from flask import Flask
 
 # imports from SQLAlchemy
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker, clear_mappers
-from sqlalchemy.pool import NullPool
 
+import music.adapters.cache as cache
 import music.adapters.repository as repo
 from music.adapters.csvdatareader import TrackCSVReader
 from music.adapters.memory_repository import MemoryRepository
-from music.adapters.orm import metadata, map_model_to_tables
+from music.adapters.orm import metadata, map_model_to_tables, create_schema, versions_table
 from music.adapters import memory_repository, database_repository, repository_populate, csvdatareader
+from music.authentication import password_hasher
 from music.domainmodel.track import Review, User
 from music.tracks import services as tracks_services
+from music.utilities.response_cache import ResponseCache
 
 
 def create_app(test_config=None):
@@ -38,22 +41,30 @@ def create_app(test_config=None):
         # Here the "magic" of our repository pattern happens. We can easily switch between in memory data and
         # persistent database data storage for our application.
 
-    if app.config['REPOSITORY'] == 'memory':
-        # Create the MemoryRepository implementation for a memory-based repository.
-        data = TrackCSVReader()
-        data.read_csv_files(data_path, repo.repo_instance, False)
+    # Set up the workers that hash passwords, stopping those of any app created earlier in this process.
+    if password_hasher.hasher_instance is not None:
+        password_hasher.hasher_instance.shutdown()
+    password_hasher.hasher_instance = password_hasher.PasswordHasher(app.config['PASSWORD_HASH_WORKERS'],
+                                                                     app.config['PASSWORD_HASH_QUEUE'],
+                                                                     app.config['PASSWORD_HASH_ITERATIONS'])
 
+    if app.config['REPOSITORY'] == 'memory':
         # Create the MemoryRepository implementation for a memory-based repository.
-        repo.repo_instance = MemoryRepository(data)
-
-        track_id = 3
-        track = tracks_services.get_track_by_id(repo.repo_instance, track_id)
-        review_text = 'my favourite track'
-        track.reviews.append(Review(track, review_text, 4))
+        repo.repo_instance = MemoryRepository(TrackCSVReader())
 
+        # Load the same tracks, users and reviews as the database, going through the repository so that its
+        # indexes and the popular tracks leaderboard are kept up to date.
         database_mode = False
+        repository_populate.populate(data_path, repo.repo_instance, database_mode, app.config['CATALOGUE_SNAPSHOT'],
+                                     app.config['CSV_READER_PROCESSES'])
+        # The services layer goes without a cache: the repository counts letters from its indexes faster than a
+        # value can be read back from a shared cache, and each process has a catalogue of its own.
+        cache.cache_instance = None
 
     elif app.config['REPOSITORY'] == 'database':
+        # Set up the cache used by the services layer.
+        cache.cache_instance = cache.make_cache(app.config)
+
         # Configure database.
         database_uri = app.config['SQLALCHEMY_DATABASE_URI']
 
@@ -62,34 +73,60 @@ def create_app(test_config=None):
         # leading to a URI of "sqlite:///music.db".
         # Note that create_engine does not establish any actual DB connection directly!
         database_echo = app.config['SQLALCHEMY_ECHO']
-        # Please do not change the settings for connect_args and poolclass!
-        database_engine = create_engine(database_uri, connect_args={"check_same_thread": False}, poolclass=NullPool,
-                                        echo=database_echo)
+        # Pooled connections are shared between request threads, so SQLite must not check which thread uses them.
+        database_engine = create_engine(database_uri, connect_args={"check_same_thread": False}, echo=database_echo,
+                                        **database_repository.pool_options(app.config))
+        if app.config['SQLITE_WAL'] and database_engine.url.get_backend_name() == 'sqlite':
+            database_repository.use_sqlite_wal(database_engine)
 
         # Create the database session factory using sessionmaker (this has to be done once, in a global manner)
         session_factory = sessionmaker(autocommit=False, autoflush=True, bind=database_engine)
         # Create the SQLAlchemy DatabaseRepository instance for an sqlite3-based repository.
-        repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory)
+        repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory, app.config['REVIEW_WRITE_BEHIND'],
+                                                                      app.config['REVIEW_BATCH_SIZE'])
+        if app.config['REVIEW_WRITE_BEHIND']:
+            # Commit any reviews still queued before the process exits.
+            atexit.register(repo.repo_instance.close)
 
         if app.config['TESTING'] == 'True' or len(database_engine.table_names()) == 0:
             print("REPOPULATING DATABASE...")
             # For testing, or first-time use of the web application, reinitialise the database.
             clear_mappers()
-            metadata.create_all(database_engine)  # Conditionally create database tables.
+            create_schema(database_engine)  # Conditionally create database tables and indexes.
             for table in reversed(metadata.sorted_tables):  # Remove any data from the tables.
-                database_engine.execute(table.delete())
+                # Except the versions, which carry on from before, so that pages cached for the old data never look
+                # current for the new (see SqlAlchemyRepository.get_leaderboard_version).
+                if table is not versions_table:
+                    database_engine.execute(table.delete())
 
             # Generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
 
             database_mode = True
-            repository_populate.populate(data_path, repo.repo_instance, database_mode)
+            repository_populate.populate(data_path, repo.repo_instance, database_mode,
+                                         app.config['CATALOGUE_SNAPSHOT'], app.config['CSV_READER_PROCESSES'])
+            # A shared cache may hold values from the data just removed. It is only cleared here, where the data is
+            # replaced, as other processes may be using it.
+            cache.cache_instance.clear()
             print("REPOPULATING DATABASE... FINISHED")
 
         else:
-            # Solely generate mappings that map domain model classes to the database tables.
+            # Solely generate mappings that map domain model classes to the database tables, replacing those of any
+            # app created earlier in this process.
+            clear_mappers()
             map_model_to_tables()
 
+            # A database made by an earlier version may lack tables and indexes added to the schema since, and its
+            # tracks then need adding to a newly made search index.
+            search_index_missing = 'tracks_search' not in inspect(database_engine).get_table_names()
+            create_schema(database_engine)
+            if search_index_missing:
+                repo.repo_instance.rebuild_search_index()
+
+    # Rendered pages of the read-only views, see utilities.response_cache.cached_response.
+    app.extensions['response_cache'] = ResponseCache(app.config['RESPONSE_CACHE_SIZE'],
+                                                     app.config['RESPONSE_CACHE_TTL'])
+
     # Build the application - these steps require an application context.
     with app.app_context():
         # Register blueprints.
@@ -111,6 +148,9 @@ def create_app(test_config=None):
         from .utilities import utilities
         app.register_blueprint(utilities.utilities_blueprint)
 
+        from .search import search
+        app.register_blueprint(search.search_blueprint)
+
         # Register a callback the makes sure that database sessions are associated with http requests
         # We reset the session inside the database repository before a new flask request is generated
         @app.before_request
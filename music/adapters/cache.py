@@ -0,0 +1,143 @@
+import abc
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# The cache used by the services layer, set up by create_app (see make_cache).
+cache_instance = None
+
+
+class AbstractCache(abc.ABC):
+    """ Values kept by string key for up to a number of seconds (the ttl). Values should be plain, picklable data, such
+    as ids and counts, rather than domain objects, so that they can be shared between processes. None is never cached.
+    """
+
+    @abc.abstractmethod
+    def get(self, key: str):
+        """ Returns the value cached for key, or None if there isn't one or it has expired. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set(self, key: str, value):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def clear(self):
+        raise NotImplementedError
+
+    def get_or_set(self, key: str, compute):
+        """ Returns the value cached for key, first caching the result of calling compute if there isn't one. """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+
+class LocalCache(AbstractCache):
+    """ A least recently used cache of at most size values in this process. """
+
+    def __init__(self, size: int = 4096, ttl: float = 300):
+        self.__size = size
+        self.__ttl = ttl
+        # key -> (expiry time (monotonic), value), least recently used first.
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key: str):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.__entries[key]
+                return None
+            self.__entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value):
+        if value is None:
+            return
+        with self.__lock:
+            self.__entries[key] = (time.monotonic() + self.__ttl, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__size:
+                self.__entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+
+class SqliteCache(AbstractCache):
+    """ Pickled values in a table of an SQLite database file, shared by every process that opens the same file, such as
+    the workers of one deployment, and kept over restarts. A local stand-in for a memcached or Redis server.
+
+    When there are more than size values, those closest to expiring are dropped.
+    """
+
+    def __init__(self, path: str, size: int = 4096, ttl: float = 300):
+        self.__path = str(path)
+        self.__size = size
+        self.__ttl = ttl
+        # sqlite3 connections may only be used by the thread that opened them.
+        self.__connections = threading.local()
+        connection = self.__connection()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)')
+        connection.execute('CREATE INDEX IF NOT EXISTS ix_cache_expires ON cache (expires)')
+
+    def __connection(self) -> sqlite3.Connection:
+        connection = getattr(self.__connections, 'connection', None)
+        if connection is None:
+            # Autocommit, waiting for up to 5 seconds for another process's write to finish.
+            connection = sqlite3.connect(self.__path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.__connections.connection = connection
+        return connection
+
+    def get(self, key: str):
+        # Wall clock time, as expiry times are compared between processes.
+        row = self.__connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND expires >= ?', (key, time.time())).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def set(self, key: str, value):
+        if value is None:
+            return
+        connection = self.__connection()
+        connection.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                           (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time() + self.__ttl))
+        connection.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires DESC LIMIT -1 '
+                           'OFFSET ?)', (self.__size,))
+
+    def delete(self, key: str):
+        self.__connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        self.__connection().execute('DELETE FROM cache')
+
+
+def make_cache(config) -> AbstractCache:
+    """ The cache backend named by config['CACHE_BACKEND']: 'local' for a LocalCache, or 'sqlite' for a SqliteCache in
+    the file config['CACHE_PATH']. """
+    backend = config['CACHE_BACKEND']
+    if backend == 'local':
+        return LocalCache(config['CACHE_SIZE'], config['CACHE_TTL'])
+    if backend == 'sqlite':
+        return SqliteCache(config['CACHE_PATH'], config['CACHE_SIZE'], config['CACHE_TTL'])
+    raise ValueError(f'Unknown cache backend: {backend}')
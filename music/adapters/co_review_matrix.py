@@ -0,0 +1,37 @@
+import heapq
+from collections import defaultdict
+
+
+class CoReviewMatrix:
+    """ Sparse item-item matrix counting, for each pair of tracks, the users who reviewed both of them.
+
+    Only the pairs that have been co-reviewed are stored (track id -> {track id: number of users}). Adding a review
+    touches just the row and column of its track for the other tracks its reviewer has reviewed, so the matrix is kept
+    up to date one review at a time instead of being rebuilt.
+    """
+
+    def __init__(self, reviews=()):
+        # reviews is an iterable of (reviewer, track id), one for each Review, reviewer being the reviewer's user name.
+        self.__tracks_of_user = defaultdict(set)
+        self.__counts = defaultdict(dict)
+        for reviewer, track_id in reviews:
+            self.add(reviewer, track_id)
+
+    def add(self, reviewer: str, track_id):
+        """ Counts a review of track_id by reviewer. A user's further reviews of the same track change nothing. """
+        reviewed = self.__tracks_of_user[reviewer]
+        if track_id in reviewed:
+            return
+        row = self.__counts[track_id]
+        for other_id in reviewed:
+            row[other_id] = row.get(other_id, 0) + 1
+            other_row = self.__counts[other_id]
+            other_row[track_id] = other_row.get(track_id, 0) + 1
+        reviewed.add(track_id)
+
+    def most_co_reviewed(self, track_id, limit: int) -> list:
+        """ Returns the ids of up to limit tracks reviewed by the most users who also reviewed track_id, most first,
+        with ties going to the lowest track id. """
+        row = self.__counts.get(track_id, {})
+        ranked = heapq.nsmallest(limit, ((-count, other_id) for other_id, count in row.items()))
+        return [other_id for _, other_id in ranked]
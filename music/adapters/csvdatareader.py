@@ -1,6 +1,13 @@
 import os
+import io
 import csv
 import ast
+import json
+import mmap
+import pickle
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 from pathlib import Path
 
@@ -39,19 +46,38 @@ def create_album_object(row):
     return album
 
 
-def extract_genres(track_row: dict):
+def parse_genre_dicts(track_genres_raw: str) -> list:
+    # The track_genres column holds the repr() of a list of dicts of strings, e.g.
+    # "[{'genre_id': '21', 'genre_title': 'Hip-Hop', 'genre_url': '...'}]".
+    # As long as no string contains a quote or a backslash, swapping the single quotes for double quotes turns that
+    # into JSON, which the C json decoder parses far faster than ast.literal_eval. Only the rare remaining values
+    # fall back to Python's own parser.
+    if '"' in track_genres_raw or '\\' in track_genres_raw:
+        genre_dicts = ast.literal_eval(track_genres_raw)
+    else:
+        genre_dicts = json.loads(track_genres_raw.replace("'", '"'))
+    if not isinstance(genre_dicts, list):
+        raise ValueError(f'Expected a list of genres: {track_genres_raw}')
+    return genre_dicts
+
+
+def extract_genres(track_row: dict, genres_by_id: dict = None):
     # List of dictionaries inside the string.
     track_genres_raw = track_row['track_genres']
     # Populate genres. track_genres can be empty (None)
     genres = []
     if track_genres_raw:
         try:
-            genre_dicts = ast.literal_eval(
-                track_genres_raw) if track_genres_raw != "" else []
+            genre_dicts = parse_genre_dicts(track_genres_raw)
 
             for genre_dict in genre_dicts:
-                genre = Genre(
-                    int(genre_dict['genre_id']), genre_dict['genre_title'])
+                genre_id = int(genre_dict['genre_id'])
+                # Share one Genre object per genre id between all tracks, when given a table to intern them in.
+                genre = genres_by_id.get(genre_id) if genres_by_id is not None else None
+                if genre is None:
+                    genre = Genre(genre_id, genre_dict['genre_title'])
+                    if genres_by_id is not None:
+                        genres_by_id[genre_id] = genre
                 genres.append(genre)
         except Exception as e:
             print(track_genres_raw)
@@ -60,9 +86,113 @@ def extract_genres(track_row: dict):
     return genres
 
 
+# The columns of the tracks csv file that are needed to build tracks, artists, genres and the link to albums.
+TRACK_COLUMNS = ('track_id', 'track_title', 'track_url', 'track_duration', 'artist_id', 'artist_name',
+                 'track_genres', 'album_id')
+
+
+def parse_track_row(track_row: dict, artist_names: dict, genre_names: dict) -> tuple:
+    # Lightweight, picklable form of a track csv row, as stored in snapshots and returned by parallel loading:
+    # (track_id, title, track_url, track_duration, artist_id, album_id, genre_ids). The names of artists and genres
+    # seen for the first time are recorded in artist_names and genre_names.
+    track_duration = round(float(
+        track_row['track_duration'])) if track_row['track_duration'] is not None else None
+    artist_id = int(track_row['artist_id'])
+    artist_names.setdefault(artist_id, track_row['artist_name'])
+    genre_ids = []
+    for genre in extract_genres(track_row):
+        genre_names.setdefault(genre.genre_id, genre.name)
+        genre_ids.append(genre.genre_id)
+    album_id = int(
+        track_row['album_id']) if track_row['album_id'].isdigit() else None
+    return (int(track_row['track_id']), track_row['track_title'], track_row['track_url'], track_duration, artist_id,
+            album_id, genre_ids)
+
+
+def find_record_end(data, position: int, in_quotes: bool) -> int:
+    # Returns the offset just past the first newline at or after position that is not inside a quoted field, given
+    # whether position itself is inside one. Quotes are counted on the raw bytes, which matches the decoded text as
+    # long as the file holds no escaped quote characters (e.g. \x22), as is the case for the FMA dumps.
+    while True:
+        newline = data.find(b'\n', position)
+        if newline == -1:
+            return len(data)
+        if data[position:newline].count(b'"') % 2 == 1:
+            in_quotes = not in_quotes
+        if not in_quotes:
+            return newline + 1
+        position = newline + 1
+
+
+def split_tracks_file(file_path: Path, number_of_chunks: int):
+    # Splits the tracks csv file into up to number_of_chunks byte ranges that each hold whole records. Returns the
+    # header row and the list of (start, end) ranges.
+    with open(str(file_path), 'rb') as track_csv:
+        if os.fstat(track_csv.fileno()).st_size == 0:
+            return [], []
+        with mmap.mmap(track_csv.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header_end = find_record_end(data, 0, False)
+            header = next(csv.reader([data[:header_end].decode('utf-8', errors='replace')]), [])
+
+            size = len(data)
+            boundaries = [header_end]
+            for chunk in range(1, number_of_chunks):
+                target = header_end + chunk * (size - header_end) // number_of_chunks
+                if target <= boundaries[-1]:
+                    continue
+                in_quotes = data[boundaries[-1]:target].count(b'"') % 2 == 1
+                record_end = find_record_end(data, target, in_quotes)
+                if record_end >= size:
+                    break
+                boundaries.append(record_end)
+            boundaries.append(size)
+
+    return header, [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+def read_tracks_chunk(file_path: str, header: list, start: int, end: int) -> tuple:
+    # Runs in a worker process: parses the track records in bytes [start, end) of the tracks csv file and returns
+    # their parse_track_row tuples with the artist and genre names they mention.
+    with open(file_path, 'rb') as track_csv:
+        track_csv.seek(start)
+        # Decoded like read_tracks_file decodes the whole file, see there.
+        text = track_csv.read(end - start).decode('utf-8', errors='replace')
+
+    columns = [(column, header.index(column)) for column in TRACK_COLUMNS if column in header]
+    tracks = []
+    artist_names = dict()
+    genre_names = dict()
+    for values in csv.reader(io.StringIO(text)):
+        if not values:
+            continue
+        track_row = {column: values[index] if index < len(values) else None for column, index in columns}
+        tracks.append(parse_track_row(track_row, artist_names, genre_names))
+    return tracks, artist_names, genre_names
+
+
+# Bump whenever the layout of the snapshot written by TrackCSVReader changes, so that stale snapshots are ignored.
+SNAPSHOT_VERSION = 3
+SNAPSHOT_FILE_NAME = 'catalogue.snapshot'
+CSV_FILE_NAMES = ('raw_albums_excerpt.csv', 'raw_tracks_excerpt.csv')
+
+
+def snapshot_key(data_path: Path) -> tuple:
+    # The snapshot is only valid for the exact CSV files it was built from.
+    key = [SNAPSHOT_VERSION]
+    for file_name in CSV_FILE_NAMES:
+        stat = os.stat(str(data_path / file_name))
+        key.append((file_name, stat.st_size, stat.st_mtime_ns))
+    return tuple(key)
+
+
 class TrackCSVReader:
 
-    def __init__(self):
+    def __init__(self, use_snapshot: bool = False, processes: int = 1):
+        # When use_snapshot is True, the parsed catalogue is cached in a binary snapshot next to the CSV files and
+        # reloaded from there for as long as the CSV files are unchanged.
+        self.__use_snapshot = use_snapshot
+        # With more than one process, the tracks file is parsed in parallel chunks by that many worker processes.
+        self.__processes = processes
 
         # if type(albums_csv_file) is str:
         #     self.__albums_csv_file = albums_csv_file
@@ -104,8 +234,8 @@ class TrackCSVReader:
             print(str(data_path / "raw_albums_excerpt.csv") + " does not exist!")
 
         album_dict = dict()
-        # encoding of unicode_escape is required to decode successfully
-        with open(str(data_path / "raw_albums_excerpt.csv"), encoding="unicode_escape") as album_csv:
+        # Decoded like the tracks file, see read_tracks_file, so that album and track text read the same.
+        with open(str(data_path / "raw_albums_excerpt.csv"), encoding='utf-8', errors='replace') as album_csv:
             reader = csv.DictReader(album_csv)
             for row in reader:
                 album_id = int(
@@ -120,33 +250,56 @@ class TrackCSVReader:
         return album_dict
 
     def read_tracks_file(self, data_path: Path):
+        # Generator of track csv rows, holding only the TRACK_COLUMNS that are used to build the catalogue, so that
+        # memory use does not grow with the size or width of the file.
         if not os.path.exists(str(data_path / "raw_tracks_excerpt.csv")):
             print(str(data_path / "raw_tracks_excerpt.csv") + " does not exist!")
             return
-        track_rows = []
-        # encoding of unicode_escape is required to decode successfully
-        with open(str(data_path / "raw_tracks_excerpt.csv"), encoding='unicode_escape') as track_csv:
-            reader = csv.DictReader(track_csv)
-            for track_row in reader:
-                track_rows.append(track_row)
-        return track_rows
+        # The file is UTF-8 apart from a few stray bytes, which are replaced rather than failing the whole read. Quoted
+        # fields are left to the csv module; the file has no escape sequences to decode.
+        with open(str(data_path / "raw_tracks_excerpt.csv"), encoding='utf-8', errors='replace') as track_csv:
+            reader = csv.reader(track_csv)
+            header = next(reader, [])
+            columns = [(column, header.index(column)) for column in TRACK_COLUMNS if column in header]
+            for values in reader:
+                # Like csv.DictReader: skip blank lines and read missing trailing values as None.
+                if not values:
+                    continue
+                yield {column: values[index] if index < len(values) else None for column, index in columns}
 
     def read_csv_files(self, data_path: Path, repo: AbstractRepository, database_mode: bool):
+        if not self.__use_snapshot or not self.read_snapshot(data_path):
+            if self.__processes > 1:
+                self.read_catalogue_in_parallel(data_path, self.__processes)
+            else:
+                self.read_catalogue(data_path)
+            if self.__use_snapshot:
+                self.write_snapshot(data_path)
+
+        # Hand the whole catalogue over at once, so that repositories can store it in bulk.
+        repo.add_catalogue(self.__dataset_of_tracks, self.__dataset_of_artists, self.__dataset_of_albums,
+                           self.__dataset_of_genres)
+
+        return self.__dataset_of_tracks
+
+    def read_catalogue(self, data_path: Path):
         # key is album_id
         albums_dict: dict = self.read_albums_file_as_dict(data_path)
-        # list of track csv rows, not track objects
-        track_rows: list = self.read_tracks_file(data_path)
+        # track csv rows, not track objects, read one at a time
+        track_rows = self.read_tracks_file(data_path)
 
         # Make sure re-initialize to empty list, so that calling this function multiple times does not create
         # duplicated dataset.
         self.__dataset_of_tracks = []
+        # Interning table, so that every track shares the one Genre object for each genre id.
+        genres_by_id = {genre.genre_id: genre for genre in self.__dataset_of_genres}
         for track_row in track_rows:
             track = create_track_object(track_row)
             artist = create_artist_object(track_row)
             track.artist = artist
 
             # Extract track_genres attributes and assign genres to the track.
-            track_genres = extract_genres(track_row)
+            track_genres = extract_genres(track_row, genres_by_id)
 
             for genre in track_genres:
                 track.add_genre(genre)
@@ -158,22 +311,105 @@ class TrackCSVReader:
             track.album = album
 
             # Populate datasets for Artist and Genre
-            if artist not in self.__dataset_of_artists:
-                repo.add_artist(artist)
-                self.__dataset_of_artists.add(artist)
+            self.__dataset_of_artists.add(artist)
 
-            if album is not None and album not in self.__dataset_of_albums:
-                repo.add_album(album)
+            if album is not None:
                 self.__dataset_of_albums.add(album)
 
             for genre in track_genres:
-                if genre not in self.__dataset_of_genres:
-                    repo.add_genre(genre)
-                    self.__dataset_of_genres.add(genre)
+                self.__dataset_of_genres.add(genre)
 
-            repo.add_track(track)
             self.__dataset_of_tracks.append(track)
 
-        return self.__dataset_of_tracks
+    def read_catalogue_in_parallel(self, data_path: Path, processes: int):
+        albums_dict: dict = self.read_albums_file_as_dict(data_path)
+        tracks_file_path = data_path / "raw_tracks_excerpt.csv"
+        header, chunks = split_tracks_file(tracks_file_path, processes)
+
+        tracks = []
+        artist_names = dict()
+        genre_names = dict()
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = executor.map(read_tracks_chunk, repeat(str(tracks_file_path)), repeat(header),
+                                   [start for start, _ in chunks], [end for _, end in chunks])
+            # Merge the chunks in file order; the first name seen for an artist or genre wins, as in read_catalogue.
+            for chunk_tracks, chunk_artist_names, chunk_genre_names in results:
+                tracks.extend(chunk_tracks)
+                for artist_id, artist_name in chunk_artist_names.items():
+                    artist_names.setdefault(artist_id, artist_name)
+                for genre_id, genre_name in chunk_genre_names.items():
+                    genre_names.setdefault(genre_id, genre_name)
+
+        self.build_catalogue(albums_dict, artist_names, genre_names, tracks)
+
+    def build_catalogue(self, albums_by_id: dict, artist_names: dict, genre_names: dict, tracks: list):
+        # Builds the datasets from parse_track_row tuples, sharing one Artist and one Genre object per id.
+        artists_by_id = {artist_id: Artist(artist_id, name) for artist_id, name in artist_names.items()}
+        genres_by_id = {genre_id: Genre(genre_id, name) for genre_id, name in genre_names.items()}
+
+        self.__dataset_of_tracks = []
+        for track_id, title, track_url, track_duration, artist_id, album_id, genre_ids in tracks:
+            track = Track(track_id, title)
+            track.track_url = track_url
+            if track_duration is not None:
+                track.track_duration = track_duration
+            track.artist = artists_by_id.get(artist_id)
+            track.album = albums_by_id.get(album_id)
+            for genre_id in genre_ids:
+                track.add_genre(genres_by_id[genre_id])
+            self.__dataset_of_tracks.append(track)
+
+            if track.artist is not None:
+                self.__dataset_of_artists.add(track.artist)
+            if track.album is not None:
+                self.__dataset_of_albums.add(track.album)
+            for genre in track.genres:
+                self.__dataset_of_genres.add(genre)
+
+    def write_snapshot(self, data_path: Path):
+        # Store plain values rather than domain objects, so the snapshot does not depend on how (or whether) the
+        # domain classes are mapped by SQLAlchemy.
+        albums = [(album.album_id, album.title, album.album_url, album.album_type, album.release_year)
+                  for album in self.__dataset_of_albums]
+        artists = [(artist.artist_id, artist.full_name) for artist in self.__dataset_of_artists]
+        genres = [(genre.genre_id, genre.name) for genre in self.__dataset_of_genres]
+        tracks = [(track.track_id, track.title, track.track_url, track.track_duration,
+                   track.artist.artist_id if track.artist is not None else None,
+                   track.album.album_id if track.album is not None else None,
+                   [genre.genre_id for genre in track.genres]) for track in self.__dataset_of_tracks]
+
+        snapshot_path = data_path / SNAPSHOT_FILE_NAME
+        temporary_path = data_path / (SNAPSHOT_FILE_NAME + '.tmp')
+        try:
+            with open(str(temporary_path), 'wb') as snapshot_file:
+                pickle.dump((snapshot_key(data_path), albums, artists, genres, tracks), snapshot_file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(str(temporary_path), str(snapshot_path))
+        except OSError as e:
+            print(f'Could not write catalogue snapshot {snapshot_path}: {e}')
+
+    def read_snapshot(self, data_path: Path) -> bool:
+        snapshot_path = data_path / SNAPSHOT_FILE_NAME
+        if not os.path.exists(str(snapshot_path)):
+            return False
+        try:
+            with open(str(snapshot_path), 'rb') as snapshot_file:
+                key, albums, artists, genres, tracks = pickle.load(snapshot_file)
+        except Exception as e:
+            print(f'Ignoring unreadable catalogue snapshot {snapshot_path}: {e}')
+            return False
+        if key != snapshot_key(data_path):
+            return False
+
+        albums_by_id = dict()
+        for album_id, title, album_url, album_type, release_year in albums:
+            album = Album(album_id, title)
+            album.album_url = album_url
+            album.album_type = album_type
+            album.release_year = release_year
+            albums_by_id[album_id] = album
+
+        self.build_catalogue(albums_by_id, dict(artists), dict(genres), tracks)
+        return True
 
 
@@ -1,12 +1,30 @@
+import logging
+import threading
+import weakref
+from collections import defaultdict
+
+from sqlalchemy import func, case, tuple_, event, pool, literal_column, select
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
-from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm import scoped_session, sessionmaker, joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from music.domainmodel.artist import Artist
 from music.domainmodel.album import Album
 from music.domainmodel.track import Track, Review, User
 from music.domainmodel.genre import Genre
-from music.adapters.repository import AbstractRepository
+from music.adapters.prefix_index import PrefixIndex
+from music.adapters.trigram_index import TrigramIndex
+from music.adapters.similarity_index import GenreSimilarityIndex
+from music.adapters.co_review_matrix import CoReviewMatrix
+from music.adapters.write_behind import WriteBehindQueue
+from music.adapters.repository import (
+    AbstractRepository, ALPHABET, SEARCH_FIELD_WEIGHTS, search_terms, search_fields
+)
+from music.adapters.orm import (
+    users_table, tracks_table, artists_table, albums_table, genres_table, reviews_table, track_genres_table,
+    tracks_search_table, versions_table
+)
 
 
 class SessionContextManager:
@@ -41,10 +59,136 @@ class SessionContextManager:
             self.__session.close()
 
 
+def pool_options(config) -> dict:
+    """ Keyword arguments for create_engine setting up the connection pool described by the SQLALCHEMY_POOL_* config
+    values. """
+    pool_class = getattr(pool, config['SQLALCHEMY_POOL_CLASS'], None)
+    if not (isinstance(pool_class, type) and issubclass(pool_class, pool.Pool)):
+        raise ValueError(f"Unknown SQLALCHEMY_POOL_CLASS: {config['SQLALCHEMY_POOL_CLASS']}")
+    options = {'poolclass': pool_class, 'pool_recycle': config['SQLALCHEMY_POOL_RECYCLE']}
+    if issubclass(pool_class, pool.QueuePool):
+        options['pool_size'] = config['SQLALCHEMY_POOL_SIZE']
+        options['max_overflow'] = config['SQLALCHEMY_MAX_OVERFLOW']
+    return options
+
+
+def use_sqlite_wal(engine):
+    """ Sets every new connection of a SQLite engine to WAL journaling with synchronous=NORMAL, so that reads go on
+    while a review is being written. """
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
+
+def alphabet_letter_of(column):
+    """ SQL counterpart of repository.alphabet_letter for the given string column. """
+    first_letter = func.upper(func.substr(column, 1, 1))
+    return case((first_letter.between('A', 'Z'), first_letter), else_='Other')
+
+
+def title_ranges(letter: str) -> list:
+    """ The [low, high) ranges of titles that fall under letter, in title order. high is None for no upper bound.
+
+    Unlike comparing alphabet_letter_of(title), range conditions can be answered from an index on the title.
+    """
+    if letter == 'Other':
+        return [('', 'A'), ('[', 'a'), ('{', None)]
+    if letter not in ALPHABET:
+        return []
+    return [(letter, chr(ord(letter) + 1)), (letter.lower(), chr(ord(letter.lower()) + 1))]
+
+
+def search_row(track: Track) -> dict:
+    """ The row of the tracks_search full-text index for track. """
+    return {'rowid': track.track_id, **search_fields(track)}
+
+
+def bump_versions(session, names, by: int = 1):
+    """ Adds by to each of the named rows of the versions table, in session's transaction. """
+    for name in names:
+        result = session.execute(versions_table.update().where(versions_table.c.name == name).values(
+            version=versions_table.c.version + by))
+        if result.rowcount == 0:
+            session.execute(versions_table.insert().values(name=name, version=by))
+
+
+def track_loading_options(load: tuple) -> list:
+    """ Eager loading options for the Track relationships named in a loading profile (see repository.TRACK_SUMMARY).
+
+    Single objects are joined into the listing query, collections are fetched with one extra query each.
+    """
+    strategies = {
+        'artist': lambda: joinedload(Track._Track__artist),
+        'album': lambda: joinedload(Track._Track__album),
+        'genres': lambda: selectinload(Track._Track__genres),
+        'reviews': lambda: selectinload(Track._Track__reviews),
+    }
+    for relationship in load:
+        if relationship not in strategies:
+            raise ValueError(f'Unknown track relationship in loading profile: {relationship}')
+    return [strategies[relationship]() for relationship in load]
+
+
 class SqlAlchemyRepository(AbstractRepository):
 
-    def __init__(self, session_factory):
+    def __init__(self, session_factory, write_behind: bool = False, review_batch_size: int = 100):
+        if write_behind:
+            # make_comment links a new Review to its track and user, which puts it in their session, and autoflush
+            # would insert it with the next query. Only the write-behind queue may store reviews, so sessions don't
+            # autoflush; every method that changes anything commits, which flushes anyway.
+            session_factory = sessionmaker(class_=session_factory.class_, **dict(session_factory.kw, autoflush=False))
         self._session_cm = SessionContextManager(session_factory)
+        self.__session_factory = session_factory
+        # Entity class -> number of rows, counted on first use and then kept up to date by the add_* methods. Forgotten
+        # on any rollback, as the rolled back changes may already have been counted.
+        self.__counts = dict()
+        # The session factory may outlive the repository, so its listener only holds a weak reference to it, and is
+        # removed along with it.
+        repository = weakref.ref(self)
+
+        def forget_counts(session):
+            alive = repository()
+            if alive is not None:
+                alive.__counts.clear()
+
+        event.listen(session_factory, 'after_rollback', forget_counts)
+        weakref.finalize(self, event.remove, session_factory, 'after_rollback', forget_counts)
+        # Prefix indexes of the track, artist and album names for autocompletion, and trigram indexes of the same names
+        # for fuzzy search, by (index class, entity class). Each is read from the database on first use and then kept
+        # up to date by the add_* methods.
+        self.__name_indexes = dict()
+        # Most similar tracks by genre, read from the database on first use and rebuilt after tracks are added.
+        self.__genre_similarity = None
+        # Users who reviewed each pair of tracks, read from the database on first use and then brought up to date with
+        # the reviews stored since, by this process or any other, each time it is used. The matrix covers the reviews
+        # up to the id after it; the lock keeps request threads from bringing it up to date at once.
+        self.__co_reviews = CoReviewMatrix()
+        self.__co_reviews_last_id = 0
+        self.__co_reviews_lock = threading.Lock()
+
+        # With write_behind, add_review queues reviews to be committed in batches by a background thread (see
+        # WriteBehindQueue for ordering, durability and shutdown), instead of committing each one itself. Reviews in
+        # the queue are kept as (track id, reviewer, Review) in the order they were added, and shown in the reviews
+        # of the tracks and users read meanwhile. The lock keeps a batch's commit from falling between reading the
+        # stored reviews and the pending ones.
+        self.__pending_reviews = []
+        self.__pending_reviews_lock = threading.Lock()
+        self.__review_queue = None
+        if write_behind:
+            self.__review_queue = WriteBehindQueue(self.__write_reviews, review_batch_size, self.__review_not_written)
+
+    def flush_reviews(self):
+        """ Waits until every review added so far has been committed. """
+        if self.__review_queue is not None:
+            self.__review_queue.flush()
+
+    def close(self):
+        """ Commits the reviews still queued and stops the write-behind queue. """
+        if self.__review_queue is not None:
+            self.__review_queue.close()
 
     def close_session(self):
         self._session_cm.close_current_session()
@@ -53,9 +197,11 @@ class SqlAlchemyRepository(AbstractRepository):
         self._session_cm.reset_session()
 
     def add_user(self, user: User):
+        # A user without an id gets the next one from the database's autoincrement.
         with self._session_cm as scm:
             scm.session.add(user)
             scm.commit()
+        self.__count_added(User)
 
     def get_user(self, user_name) -> User:
         user = None
@@ -64,7 +210,7 @@ class SqlAlchemyRepository(AbstractRepository):
         except NoResultFound:
             # Ignore any exception and return None.
             pass
-        return user
+        return self.__with_pending_reviews(user)
 
     def get_tracks(self):
         return self._session_cm.session.query(Track)
@@ -75,37 +221,166 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_albums(self):
         return self._session_cm.session.query(Album)
 
+    def get_tracks_for_artist(self, artist_id, load: tuple = ()) -> list:
+        return self._session_cm.session.query(Track).options(*track_loading_options(load)).filter(
+            tracks_table.c.artist_id == int(artist_id)).order_by(tracks_table.c.title).all()
+
+    def get_tracks_for_album(self, album_id, load: tuple = ()) -> list:
+        return self._session_cm.session.query(Track).options(*track_loading_options(load)).filter(
+            tracks_table.c.album_id == int(album_id)).order_by(tracks_table.c.title).all()
+
+    def get_tracks_for_genre(self, genre_id, load: tuple = ()) -> list:
+        return self._session_cm.session.query(Track).options(*track_loading_options(load)).join(
+            track_genres_table, track_genres_table.c.track_id == tracks_table.c.track_id).filter(
+            track_genres_table.c.genre_id == int(genre_id)).order_by(tracks_table.c.title).all()
+
     def add_track(self, track: Track):
         with self._session_cm as scm:
-            scm.session.merge(track)
+            is_new = scm.session.merge(track) in scm.session.new
+            # Keep the search index in step, replacing any earlier entry for the track.
+            scm.session.execute(tracks_search_table.insert().prefix_with('OR REPLACE'), search_row(track))
+            bump_versions(scm.session, ['Track', 'leaderboard'])
             scm.commit()
+        # The track's genres may have changed even if the track itself is not new.
+        self.__genre_similarity = None
+        if is_new:
+            self.__count_added(Track)
+            self.__name_added(Track, track.track_id, track.title)
 
     def add_artist(self, artist: Artist):
         with self._session_cm as scm:
-            scm.session.merge(artist)
+            is_new = scm.session.merge(artist) in scm.session.new
+            bump_versions(scm.session, ['Artist'])
             scm.commit()
+        if is_new:
+            self.__count_added(Artist)
+            self.__name_added(Artist, artist.artist_id, artist.full_name)
 
     def add_album(self, album: Album):
         with self._session_cm as scm:
-            scm.session.merge(album)
+            is_new = scm.session.merge(album) in scm.session.new
+            bump_versions(scm.session, ['Album'])
             scm.commit()
+        if is_new:
+            self.__count_added(Album)
+            self.__name_added(Album, album.album_id, album.title)
 
     def add_genre(self, genre: Genre):
         with self._session_cm as scm:
-            scm.session.merge(genre)
+            is_new = scm.session.merge(genre) in scm.session.new
+            bump_versions(scm.session, ['Genre'])
+            scm.commit()
+        if is_new:
+            self.__count_added(Genre)
+
+    def add_catalogue(self, tracks, artists, albums, genres):
+        # Bulk insert straight into the tables (one executemany per table, all in a single transaction) rather
+        # than merging and committing every entity on its own. Intended for populating an empty database.
+        artist_rows = [{'artist_id': artist.artist_id, 'full_name': artist.full_name} for artist in artists]
+        album_rows = [{'album_id': album.album_id, 'title': album.title, 'album_url': album.album_url,
+                       'album_type': album.album_type, 'release_year': album.release_year} for album in albums]
+        genre_rows = [{'genre_id': genre.genre_id, 'name': genre.name} for genre in genres]
+        track_rows = [{'track_id': track.track_id, 'track_duration': track.track_duration, 'title': track.title,
+                       'artist_id': track.artist.artist_id if track.artist is not None else None,
+                       'album_id': track.album.album_id if track.album is not None else None,
+                       'track_url': track.track_url} for track in tracks]
+        track_genre_rows = [{'track_id': track.track_id, 'genre_id': genre.genre_id}
+                            for track in tracks for genre in track.genres]
+        search_rows = [search_row(track) for track in tracks]
+
+        with self._session_cm as scm:
+            for table, rows in ((artists_table, artist_rows), (albums_table, album_rows), (genres_table, genre_rows),
+                                (tracks_table, track_rows), (track_genres_table, track_genre_rows)):
+                if len(rows) > 0:
+                    scm.session.execute(table.insert(), rows)
+            # The search index isn't cleared along with the tables, so rebuild it from scratch.
+            scm.session.execute(tracks_search_table.delete())
+            if len(search_rows) > 0:
+                scm.session.execute(tracks_search_table.insert(), search_rows)
+            bump_versions(scm.session, ['Track', 'Artist', 'Album', 'Genre', 'leaderboard'])
+            scm.commit()
+        self.__counts.clear()
+        self.__name_indexes.clear()
+        self.__genre_similarity = None
+
+    def rebuild_search_index(self):
+        """ Fills the full-text search index from scratch with the tracks stored, e.g. for a database made before the
+        index existed. """
+        tracks = self._session_cm.session.query(Track).options(
+            *track_loading_options(('artist', 'album', 'genres'))).all()
+        search_rows = [search_row(track) for track in tracks]
+        with self._session_cm as scm:
+            scm.session.execute(tracks_search_table.delete())
+            if len(search_rows) > 0:
+                scm.session.execute(tracks_search_table.insert(), search_rows)
             scm.commit()
 
     def get_number_of_tracks(self) -> int:
-        return self._session_cm.session.query(Track).count()
+        return self.__count(Track)
 
     def get_number_of_artists(self) -> int:
-        return self._session_cm.session.query(Artist).count()
+        return self.__count(Artist)
 
     def get_number_of_albums(self) -> int:
-        return self._session_cm.session.query(Album).count()
+        return self.__count(Album)
 
     def get_number_of_genres(self) -> int:
-        return self._session_cm.session.query(Genre).count()
+        return self.__count(Genre)
+
+    def get_tracks_by_letter(self, letter: str, offset: int = 0, limit: int = None, load: tuple = ()) -> list:
+        # Ties broken by track id, in the same order as get_tracks_page, so that paging back by offset and forward by
+        # keyset go through the same sequence of tracks (and the same index).
+        return self.__query_by_letter(Track, tracks_table.c.title, letter, offset, limit,
+                                      track_loading_options(load), tracks_table.c.track_id)
+
+    def get_tracks_page(self, first_letter: str, after_title: str = None, limit: int = 45, after_track_id: int = None,
+                        load: tuple = ()) -> list:
+        title, track_id = tracks_table.c.title, tracks_table.c.track_id
+        tracks = []
+        # One index range scan per range of titles, stopping as soon as the page is full.
+        for low, high in title_ranges(first_letter):
+            if len(tracks) >= limit:
+                break
+            query = self._session_cm.session.query(Track).options(*track_loading_options(load)).filter(title >= low)
+            if high is not None:
+                query = query.filter(title < high)
+            if after_title is not None and after_track_id is None:
+                query = query.filter(title > after_title)
+            elif after_title is not None:
+                query = query.filter(tuple_(title, track_id) > tuple_(after_title, after_track_id))
+            tracks += query.order_by(title, track_id).limit(limit - len(tracks)).all()
+        return tracks
+
+    def get_track_letter_counts(self) -> dict:
+        return self.__letter_counts(tracks_table.c.title)
+
+    def get_artists_by_letter(self, letter: str, offset: int = 0, limit: int = None) -> list:
+        return self.__query_by_letter(Artist, artists_table.c.full_name, letter, offset, limit)
+
+    def get_artist_letter_counts(self) -> dict:
+        return self.__letter_counts(artists_table.c.full_name)
+
+    def get_albums_by_letter(self, letter: str, offset: int = 0, limit: int = None) -> list:
+        return self.__query_by_letter(Album, albums_table.c.title, letter, offset, limit)
+
+    def get_album_letter_counts(self) -> dict:
+        return self.__letter_counts(albums_table.c.title)
+
+    def __query_by_letter(self, entity, column, letter: str, offset: int, limit: int, options: list = (),
+                          tie_breaker=None) -> list:
+        order = [column] if tie_breaker is None else [column, tie_breaker]
+        query = self._session_cm.session.query(entity).options(*options).filter(
+            alphabet_letter_of(column) == letter).order_by(*order).offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def __letter_counts(self, column) -> dict:
+        letter_of_column = alphabet_letter_of(column)
+        letter_counts = {letter: 0 for letter in ALPHABET}
+        for letter, count in self._session_cm.session.query(letter_of_column, func.count()).group_by(letter_of_column):
+            letter_counts[letter] = count
+        return letter_counts
 
     def get_track_by_id(self, track_id):
         track = None
@@ -114,7 +389,7 @@ class SqlAlchemyRepository(AbstractRepository):
         except NoResultFound:
             # Ignore any exception and return None.
             pass
-        return track
+        return self.__with_pending_reviews(track)
 
     def get_artist_by_id(self, artist_id):
         artist = None
@@ -145,13 +420,174 @@ class SqlAlchemyRepository(AbstractRepository):
 
     def add_review(self, review: Review):
         super().add_review(review)
-        with self._session_cm as scm:
-            scm.session.merge(review)
-            scm.commit()
+        track_id = review.track.track_id
+        if self.__review_queue is None:
+            with self._session_cm as scm:
+                scm.session.merge(review)
+                bump_versions(scm.session, ['Review', 'leaderboard'])
+                scm.commit()
+        else:
+            # Adding the review to its track and user put it in this session too; only the queue may store it.
+            self._session_cm.rollback()
+            user_id = self._session_cm.session.execute(
+                select(users_table.c.user_id).where(users_table.c.user_name == review.reviewer)).scalar_one()
+            row = {'track_id': track_id, 'user_id': user_id, 'review_text': review.review_text,
+                   'rating': review.rating, 'timestamp': review.timestamp, 'reviewer': review.reviewer}
+            with self.__pending_reviews_lock:
+                self.__pending_reviews.append((track_id, review.reviewer, review))
+            self.__review_queue.put((row, review))
+
+    def __write_reviews(self, batch: list):
+        # Runs on the queue's thread, so uses a session of its own. One insert and one commit for the whole batch.
+        session = self.__session_factory()
+        try:
+            session.execute(reviews_table.insert(), [row for row, _ in batch])
+            bump_versions(session, ['Review', 'leaderboard'], len(batch))
+            with self.__pending_reviews_lock:
+                session.commit()
+                self.__forget_pending_reviews(batch)
+        finally:
+            session.close()
+
+    def __review_not_written(self, item, exception: Exception):
+        row, _ = item
+        logging.getLogger(__name__).error('Could not store the review of track %s by %s: %s', row['track_id'],
+                                          row['reviewer'], exception)
+        with self.__pending_reviews_lock:
+            self.__forget_pending_reviews([item])
+
+    def __forget_pending_reviews(self, batch: list):
+        written = {id(review) for _, review in batch}
+        self.__pending_reviews = [entry for entry in self.__pending_reviews if id(entry[2]) not in written]
+
+    def __with_pending_reviews(self, entity):
+        # Shows the reviews still in the write-behind queue in the reviews of a Track or User, as if they had been
+        # loaded with the stored ones.
+        if entity is None:
+            return entity
+        if isinstance(entity, Track):
+            position, key, attribute = 0, entity.track_id, '_Track__reviews'
+        else:
+            position, key, attribute = 1, entity.user_name, '_User__reviews'
+        with self.__pending_reviews_lock:
+            pending = [entry[2] for entry in self.__pending_reviews if entry[position] == key]
+            if len(pending) == 0:
+                return entity
+            reviews = list(getattr(entity, attribute))
+            # By identity, as comparing Reviews would load each one's track.
+            shown = {id(review) for review in reviews}
+            reviews.extend(review for review in pending if id(review) not in shown)
+            set_committed_value(entity, attribute, reviews)
+        return entity
+
+    def search_tracks(self, query: str, limit: int = 45) -> list:
+        terms = search_terms(query)
+        if len(terms) == 0:
+            return []
+        # Quoting each word makes FTS5 match it literally, and listing them matches tracks with all of them.
+        match = ' '.join(f'"{term}"' for term in terms)
+        rank = func.bm25(literal_column('tracks_search'), *SEARCH_FIELD_WEIGHTS.values())
+        return self._session_cm.session.query(Track).join(
+            tracks_search_table, tracks_search_table.c.rowid == tracks_table.c.track_id).filter(
+            literal_column('tracks_search').op('MATCH')(match)).order_by(
+            rank, tracks_table.c.title, tracks_table.c.track_id).limit(limit).all()
+
+    def get_name_suggestions(self, prefix: str, limit: int = 5) -> dict:
+        return {
+            'tracks': self.__name_index(PrefixIndex, Track).starting_with(prefix, limit),
+            'artists': self.__name_index(PrefixIndex, Artist).starting_with(prefix, limit),
+            'albums': self.__name_index(PrefixIndex, Album).starting_with(prefix, limit),
+        }
+
+    def fuzzy_search(self, query: str, limit: int = 10) -> dict:
+        return {
+            'tracks': self.__name_index(TrigramIndex, Track).most_similar(query, limit),
+            'artists': self.__name_index(TrigramIndex, Artist).most_similar(query, limit),
+            'albums': self.__name_index(TrigramIndex, Album).most_similar(query, limit),
+        }
+
+    def __name_index(self, index_class, entity):
+        if (index_class, entity) not in self.__name_indexes:
+            id_column, name_column = {
+                Track: (tracks_table.c.track_id, tracks_table.c.title),
+                Artist: (artists_table.c.artist_id, artists_table.c.full_name),
+                Album: (albums_table.c.album_id, albums_table.c.title),
+            }[entity]
+            rows = self._session_cm.session.execute(select(id_column, name_column).where(name_column.isnot(None)))
+            self.__name_indexes[(index_class, entity)] = index_class(tuple(row) for row in rows)
+        return self.__name_indexes[(index_class, entity)]
+
+    def __name_added(self, entity, entity_id, name: str):
+        if name is None:
+            return
+        for index_class in (PrefixIndex, TrigramIndex):
+            if (index_class, entity) in self.__name_indexes:
+                self.__name_indexes[(index_class, entity)].add(entity_id, name)
+
+    def get_similar_tracks(self, track_id, k: int = 5, load: tuple = ()) -> list:
+        if self.__genre_similarity is None:
+            genres_of_track = defaultdict(list)
+            rows = self._session_cm.session.execute(select(track_genres_table.c.track_id, track_genres_table.c.genre_id))
+            for other_id, genre_id in rows:
+                genres_of_track[other_id].append(genre_id)
+            self.__genre_similarity = GenreSimilarityIndex(genres_of_track.items())
+
+        return self.__tracks_in_order(self.__genre_similarity.most_similar(int(track_id), k), load)
+
+    def __tracks_in_order(self, track_ids: list, load: tuple) -> list:
+        # The Tracks with track_ids, fetched in one query and returned in the order of track_ids.
+        if len(track_ids) == 0:
+            return []
+        tracks = self._session_cm.session.query(Track).options(*track_loading_options(load)).filter(
+            tracks_table.c.track_id.in_(track_ids)).all()
+        tracks_by_id = {track.track_id: track for track in tracks}
+        return [tracks_by_id[track_id] for track_id in track_ids if track_id in tracks_by_id]
+
+    def get_co_reviewed_tracks(self, track_id, k: int = 5, load: tuple = ()) -> list:
+        # Counted from the stored reviews only, like the Review version that pages showing them are cached under;
+        # reviews in the write-behind queue are counted once they are committed.
+        with self.__co_reviews_lock:
+            for review_id, reviewer, reviewed_id in self._session_cm.session.execute(
+                    select(reviews_table.c.id, reviews_table.c.reviewer, reviews_table.c.track_id).where(
+                        reviews_table.c.id > self.__co_reviews_last_id).order_by(reviews_table.c.id)):
+                self.__co_reviews.add(reviewer, reviewed_id)
+                self.__co_reviews_last_id = review_id
+            track_ids = self.__co_reviews.most_co_reviewed(int(track_id), k)
+        return self.__tracks_in_order(track_ids, load)
+
+    def get_top_tracks(self, quantity: int, load: tuple = ()) -> list:
+        return self._session_cm.session.query(Track).options(*track_loading_options(load)).outerjoin(
+            reviews_table, reviews_table.c.track_id == tracks_table.c.track_id).group_by(
+            tracks_table.c.track_id).order_by(
+            func.count(reviews_table.c.id).desc(), tracks_table.c.track_id).limit(quantity).all()
+
+    # Versions are read from the database, so that they change along with whatever any process adds. They change when
+    # it is committed, as the data they stand for (the leaderboard of get_top_tracks, for one) is read from the stored
+    # rows: reviews in the write-behind queue bump them with the batch they are committed in.
+    def get_entity_version(self, entity) -> int:
+        return self.__stored_version(entity.__name__)
+
+    def get_leaderboard_version(self) -> int:
+        return self.__stored_version('leaderboard')
+
+    def __stored_version(self, name: str) -> int:
+        version = self._session_cm.session.execute(
+            select(versions_table.c.version).where(versions_table.c.name == name)).scalar()
+        return 0 if version is None else version
 
     def get_reviews(self):
-        return self._session_cm.session.query(Review).all()
+        with self.__pending_reviews_lock:
+            return self._session_cm.session.query(Review).all() + [entry[2] for entry in self.__pending_reviews]
 
     def get_number_of_users(self):
-        return self._session_cm.session.query(User).count()
+        return self.__count(User)
+
+    def __count(self, entity) -> int:
+        if entity not in self.__counts:
+            self.__counts[entity] = self._session_cm.session.query(entity).count()
+        return self.__counts[entity]
+
+    def __count_added(self, entity):
+        if entity in self.__counts:
+            self.__counts[entity] += 1
 
@@ -1,5 +1,17 @@
-from music.adapters.repository import AbstractRepository
+import heapq
+import math
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+
+from music.adapters.repository import (
+    AbstractRepository, ALPHABET, SEARCH_FIELD_WEIGHTS, alphabet_letter, search_terms, search_fields
+)
 from music.adapters.csvdatareader import TrackCSVReader
+from music.adapters.prefix_index import PrefixIndex
+from music.adapters.trigram_index import TrigramIndex
+from music.adapters.similarity_index import GenreSimilarityIndex
+from music.adapters.co_review_matrix import CoReviewMatrix
 from music.domainmodel.artist import Artist
 from music.domainmodel.album import Album
 from music.domainmodel.track import Track, Review, User
@@ -10,88 +22,343 @@ class MemoryRepository(AbstractRepository):
 
     def __init__(self, data: TrackCSVReader):
         self.__users = list()
+        self.__last_user_id = 0
         self.__reviews = list()
-        self.__data = data
+
+        # Copy whatever the reader has already loaded, so that tracks added later through add_track (e.g. while the
+        # reader is still loading into this repository) are stored exactly once.
+        self.__tracks = list(data.dataset_of_tracks)
+        self.__artists = set(data.dataset_of_artists)
+        self.__albums = set(data.dataset_of_albums)
+        self.__genres = set(data.dataset_of_genres)
+
+        # id -> entity indexes, kept in step with the datasets above by the add_* methods.
+        self.__tracks_by_id = {track.track_id: track for track in self.__tracks}
+        self.__artists_by_id = {artist.artist_id: artist for artist in self.__artists}
+        self.__albums_by_id = {album.album_id: album for album in self.__albums}
+        self.__genres_by_id = {genre.genre_id: genre for genre in self.__genres}
+
+        # Reverse indexes from artist/album/genre id to that entity's tracks, each kept sorted by title. Alphabetical
+        # browsing buckets: letter -> entities under that letter, kept sorted by title/full name (tracks by title and
+        # then track id, which is the order get_tracks_page pages through). Prefix indexes of the track, artist and
+        # album names for autocompletion, and trigram indexes for fuzzy search. The inverted search index: word ->
+        # {track id: total SEARCH_FIELD_WEIGHTS of the track's fields with the word}. All built by __build_indexes,
+        # and then kept up to date by the add_* methods.
+        self.__build_indexes()
+        # Most similar tracks by genre, built on first use and rebuilt after tracks are added.
+        self.__genre_similarity = None
+
+        # Popular tracks leaderboard: (-number of reviews, catalogue position, track id) for every reviewed track,
+        # kept sorted by add_review so the most reviewed tracks can be read off the front.
+        self.__track_positions = {track.track_id: position for position, track in enumerate(self.__tracks)}
+        self.__review_counts = dict()
+        self.__leaderboard = list()
+        # Versions count up from the time the repository was made rather than from 0, so that they never repeat those of
+        # an earlier process, whose data (and the pages cached from it) may have been different.
+        version_base = time.time_ns()
+        # Changed along with the leaderboard and by add_track, see get_leaderboard_version.
+        self.__leaderboard_version = version_base
+        # Entity class -> version, changed by the add_* methods, see get_entity_version.
+        self.__entity_versions = defaultdict(lambda: version_base)
+
+        # Users who reviewed each pair of tracks, for "also reviewed" recommendations.
+        self.__co_reviews = CoReviewMatrix()
+
+    def __build_indexes(self):
+        # Builds the indexes from scratch, sorting each bucket once rather than inserting into it in order.
+        self.__tracks_by_artist = defaultdict(list)
+        self.__tracks_by_album = defaultdict(list)
+        self.__tracks_by_genre = defaultdict(list)
+        self.__tracks_by_letter = {letter: [] for letter in ALPHABET}
+        self.__artists_by_letter = {letter: [] for letter in ALPHABET}
+        self.__albums_by_letter = {letter: [] for letter in ALPHABET}
+        self.__search_index = defaultdict(dict)
+
+        for track in self.__tracks:
+            self.__tracks_by_letter[alphabet_letter(track.title)].append(track)
+            if track.artist is not None:
+                self.__tracks_by_artist[track.artist.artist_id].append(track)
+            if track.album is not None:
+                self.__tracks_by_album[track.album.album_id].append(track)
+            for genre in track.genres:
+                self.__tracks_by_genre[genre.genre_id].append(track)
+            self.__index_search_terms(track)
+        for artist in self.__artists:
+            self.__artists_by_letter[alphabet_letter(artist.full_name)].append(artist)
+        for album in self.__albums:
+            self.__albums_by_letter[alphabet_letter(album.title)].append(album)
+
+        # Stable sorts, so that tracks with the same title stay in catalogue order, as insort would leave them.
+        for bucket in self.__tracks_by_letter.values():
+            bucket.sort(key=lambda x: (x.title, x.track_id))
+        for buckets in (self.__tracks_by_artist, self.__tracks_by_album, self.__tracks_by_genre):
+            for bucket in buckets.values():
+                bucket.sort(key=lambda x: x.title)
+        for bucket in self.__artists_by_letter.values():
+            bucket.sort(key=lambda x: x.full_name)
+        for bucket in self.__albums_by_letter.values():
+            bucket.sort(key=lambda x: x.title)
+
+        track_names = [(track.track_id, track.title) for track in self.__tracks if track.title is not None]
+        artist_names = [(artist.artist_id, artist.full_name) for artist in self.__artists
+                        if artist.full_name is not None]
+        album_names = [(album.album_id, album.title) for album in self.__albums if album.title is not None]
+        self.__track_names, self.__track_trigrams = PrefixIndex(track_names), TrigramIndex(track_names)
+        self.__artist_names, self.__artist_trigrams = PrefixIndex(artist_names), TrigramIndex(artist_names)
+        self.__album_names, self.__album_trigrams = PrefixIndex(album_names), TrigramIndex(album_names)
 
     def add_user(self, user: User):
+        if user.user_id is None:
+            # Number users from 1 upwards, like the database's autoincrement.
+            user.user_id = self.__last_user_id + 1
+        self.__last_user_id = max(self.__last_user_id, user.user_id)
         self.__users.append(user)
 
     def get_user(self, user_name) -> User:
         return next((user for user in self.__users if user.user_name == user_name), None)
 
     def get_tracks(self):
-        return self.__data.dataset_of_tracks
+        return self.__tracks
 
     def get_artists(self):
-        return self.__data.dataset_of_artists
+        return self.__artists
 
     def get_albums(self):
-        return self.__data.dataset_of_albums
+        return self.__albums
 
     def add_track(self, track: Track):
-        self.__data.dataset_of_tracks.append(track)
+        if track.track_id in self.__tracks_by_id:
+            return
+        self.__track_positions[track.track_id] = len(self.__tracks)
+        self.__tracks.append(track)
+        self.__tracks_by_id[track.track_id] = track
+        self.__index_track(track)
+        self.__genre_similarity = None
+        self.__leaderboard_version += 1
+        self.__entity_versions[Track] += 1
+        if track.title is not None:
+            self.__track_names.add(track.track_id, track.title)
+            self.__track_trigrams.add(track.track_id, track.title)
+
+    def __index_track(self, track: Track):
+        insort(self.__tracks_by_letter[alphabet_letter(track.title)], track, key=lambda x: (x.title, x.track_id))
+        if track.artist is not None:
+            insort(self.__tracks_by_artist[track.artist.artist_id], track, key=lambda x: x.title)
+        if track.album is not None:
+            insort(self.__tracks_by_album[track.album.album_id], track, key=lambda x: x.title)
+        for genre in track.genres:
+            insort(self.__tracks_by_genre[genre.genre_id], track, key=lambda x: x.title)
+        self.__index_search_terms(track)
+
+    def __index_search_terms(self, track: Track):
+        weights = defaultdict(float)
+        for field, text in search_fields(track).items():
+            for term in set(search_terms(text)):
+                weights[term] += SEARCH_FIELD_WEIGHTS[field]
+        for term, weight in weights.items():
+            self.__search_index[term][track.track_id] = weight
+
+    # The load profiles accepted by the track listings are ignored, everything is already in memory. The listings are
+    # copies, so that callers can't change the indexes.
+    def get_tracks_for_artist(self, artist_id, load: tuple = ()) -> list:
+        return list(self.__tracks_by_artist.get(int(artist_id), []))
+
+    def get_tracks_for_album(self, album_id, load: tuple = ()) -> list:
+        return list(self.__tracks_by_album.get(int(album_id), []))
+
+    def get_tracks_for_genre(self, genre_id, load: tuple = ()) -> list:
+        return list(self.__tracks_by_genre.get(int(genre_id), []))
 
     def add_artist(self, artist: Artist):
-        self.__data.dataset_of_artists.add(artist)
+        if artist.artist_id in self.__artists_by_id:
+            return
+        self.__artists.add(artist)
+        self.__artists_by_id[artist.artist_id] = artist
+        if artist.full_name is not None:
+            self.__artist_names.add(artist.artist_id, artist.full_name)
+            self.__artist_trigrams.add(artist.artist_id, artist.full_name)
+        insort(self.__artists_by_letter[alphabet_letter(artist.full_name)], artist, key=lambda x: x.full_name)
+        self.__entity_versions[Artist] += 1
 
     def add_album(self, album: Album):
-        self.__data.dataset_of_albums.add(album)
+        if album.album_id in self.__albums_by_id:
+            return
+        self.__albums.add(album)
+        self.__albums_by_id[album.album_id] = album
+        if album.title is not None:
+            self.__album_names.add(album.album_id, album.title)
+            self.__album_trigrams.add(album.album_id, album.title)
+        insort(self.__albums_by_letter[alphabet_letter(album.title)], album, key=lambda x: x.title)
+        self.__entity_versions[Album] += 1
 
     def add_genre(self, genre: Genre):
-        self.__data.dataset_of_genres.add(genre)
+        if genre.genre_id in self.__genres_by_id:
+            return
+        self.__genres.add(genre)
+        self.__genres_by_id[genre.genre_id] = genre
+        self.__entity_versions[Genre] += 1
+
+    def add_catalogue(self, tracks, artists, albums, genres):
+        # Stores the new entities and then builds the indexes once, which is O(n log n) overall, rather than inserting
+        # into the sorted buckets and indexes one entity at a time.
+        for artist in artists:
+            if artist.artist_id not in self.__artists_by_id:
+                self.__artists.add(artist)
+                self.__artists_by_id[artist.artist_id] = artist
+        for album in albums:
+            if album.album_id not in self.__albums_by_id:
+                self.__albums.add(album)
+                self.__albums_by_id[album.album_id] = album
+        for genre in genres:
+            if genre.genre_id not in self.__genres_by_id:
+                self.__genres.add(genre)
+                self.__genres_by_id[genre.genre_id] = genre
+        for track in tracks:
+            if track.track_id not in self.__tracks_by_id:
+                self.__track_positions[track.track_id] = len(self.__tracks)
+                self.__tracks.append(track)
+                self.__tracks_by_id[track.track_id] = track
+        self.__build_indexes()
+        self.__genre_similarity = None
+        self.__leaderboard_version += 1
+        for entity in (Track, Artist, Album, Genre):
+            self.__entity_versions[entity] += 1
+
+    def get_tracks_by_letter(self, letter: str, offset: int = 0, limit: int = None, load: tuple = ()) -> list:
+        return self.__page_of(self.__tracks_by_letter, letter, offset, limit)
+
+    def get_tracks_page(self, first_letter: str, after_title: str = None, limit: int = 45, after_track_id: int = None,
+                        load: tuple = ()) -> list:
+        bucket = self.__tracks_by_letter.get(first_letter, [])
+        start = 0
+        if after_title is not None:
+            after_key = (after_title, after_track_id if after_track_id is not None else float('inf'))
+            start = bisect_right(bucket, after_key, key=lambda x: (x.title, x.track_id))
+        return bucket[start:start + limit]
+
+    def get_track_letter_counts(self) -> dict:
+        return {letter: len(bucket) for letter, bucket in self.__tracks_by_letter.items()}
+
+    def get_artists_by_letter(self, letter: str, offset: int = 0, limit: int = None) -> list:
+        return self.__page_of(self.__artists_by_letter, letter, offset, limit)
+
+    def get_artist_letter_counts(self) -> dict:
+        return {letter: len(bucket) for letter, bucket in self.__artists_by_letter.items()}
+
+    def get_albums_by_letter(self, letter: str, offset: int = 0, limit: int = None) -> list:
+        return self.__page_of(self.__albums_by_letter, letter, offset, limit)
+
+    def get_album_letter_counts(self) -> dict:
+        return {letter: len(bucket) for letter, bucket in self.__albums_by_letter.items()}
+
+    @staticmethod
+    def __page_of(buckets: dict, letter: str, offset: int, limit: int) -> list:
+        bucket = buckets.get(letter, [])
+        if limit is None:
+            return bucket[offset:]
+        return bucket[offset:offset + limit]
 
     def get_number_of_tracks(self) -> int:
-        return len(self.__data.dataset_of_tracks)
+        return len(self.__tracks)
 
     def get_number_of_artists(self) -> int:
-        return len(self.__data.dataset_of_artists)
+        return len(self.__artists)
 
     def get_number_of_albums(self) -> int:
-        return len(self.__data.dataset_of_albums)
+        return len(self.__albums)
 
     def get_number_of_genres(self) -> int:
-        return len(self.__data.dataset_of_genres)
+        return len(self.__genres)
 
     def get_track_by_id(self, track_id):
-        chosen_track = None
-        for track in self.__data.dataset_of_tracks:
-            if int(track_id) == track.track_id:
-                chosen_track = track
-                return chosen_track
-        return chosen_track
+        return self.__tracks_by_id.get(int(track_id))
 
     def get_artist_by_id(self, artist_id):
-        chosen_artist = None
-        for artist in self.__data.dataset_of_artists:
-            if int(artist_id) == artist.artist_id:
-                chosen_artist = artist
-                return chosen_artist
-        return chosen_artist
+        return self.__artists_by_id.get(int(artist_id))
 
     def get_album_by_id(self, album_id):
-        chosen_album = None
-        for album in self.__data.dataset_of_albums:
-            if int(album_id) == album.album_id:
-                chosen_album = album
-                return chosen_album
-        return chosen_album
+        return self.__albums_by_id.get(int(album_id))
 
     def get_genre_by_id(self, genre_id):
-        chosen_genre = None
-        for genre in self.__data.dataset_of_genres:
-            if int(genre_id) == genre.genre_id:
-                chosen_genre = genre
-                return chosen_genre
-        return chosen_genre
+        return self.__genres_by_id.get(int(genre_id))
 
     def add_review(self, review: Review):
         # call parent class first, add_review relies on implementation of code common to all derived classes
         super().add_review(review)
         self.__reviews.append(review)
+        self.__update_leaderboard(review.track)
+        self.__entity_versions[Review] += 1
+        self.__co_reviews.add(review.reviewer, review.track.track_id)
+
+    def __update_leaderboard(self, track: Track):
+        track_id = track.track_id
+        position = self.__track_positions.get(track_id, len(self.__tracks))
+        if track_id in self.__review_counts:
+            old_entry = (-self.__review_counts[track_id], position, track_id)
+            del self.__leaderboard[bisect_left(self.__leaderboard, old_entry)]
+        self.__review_counts[track_id] = len(track.reviews)
+        insort(self.__leaderboard, (-self.__review_counts[track_id], position, track_id))
+        self.__leaderboard_version += 1
+
+    def search_tracks(self, query: str, limit: int = 45) -> list:
+        # Rarest word first, so that the candidates to check against the other words are as few as possible.
+        postings = sorted((self.__search_index.get(term, {}) for term in set(search_terms(query))), key=len)
+        if len(postings) == 0 or len(postings[0]) == 0:
+            return []
+        candidates = [track_id for track_id in postings[0] if all(track_id in other for other in postings[1:])]
+
+        # Rank by field weight, scaled up for words that few tracks contain (idf).
+        number_of_tracks = len(self.__tracks)
+        idfs = [math.log(1 + number_of_tracks / len(posting)) for posting in postings]
+
+        def rank(track_id):
+            score = sum(posting[track_id] * idf for posting, idf in zip(postings, idfs))
+            track = self.__tracks_by_id[track_id]
+            return -score, track.title or '', track_id
+
+        return [self.__tracks_by_id[track_id] for track_id in heapq.nsmallest(limit, candidates, key=rank)]
+
+    def get_name_suggestions(self, prefix: str, limit: int = 5) -> dict:
+        return {
+            'tracks': self.__track_names.starting_with(prefix, limit),
+            'artists': self.__artist_names.starting_with(prefix, limit),
+            'albums': self.__album_names.starting_with(prefix, limit),
+        }
+
+    def fuzzy_search(self, query: str, limit: int = 10) -> dict:
+        return {
+            'tracks': self.__track_trigrams.most_similar(query, limit),
+            'artists': self.__artist_trigrams.most_similar(query, limit),
+            'albums': self.__album_trigrams.most_similar(query, limit),
+        }
+
+    def get_similar_tracks(self, track_id, k: int = 5, load: tuple = ()) -> list:
+        if self.__genre_similarity is None:
+            self.__genre_similarity = GenreSimilarityIndex(
+                (track.track_id, [genre.genre_id for genre in track.genres]) for track in self.__tracks)
+        return [self.__tracks_by_id[other_id] for other_id in self.__genre_similarity.most_similar(int(track_id), k)]
+
+    def get_co_reviewed_tracks(self, track_id, k: int = 5, load: tuple = ()) -> list:
+        return [self.__tracks_by_id[other_id] for other_id in self.__co_reviews.most_co_reviewed(int(track_id), k)]
+
+    def get_top_tracks(self, quantity: int, load: tuple = ()) -> list:
+        top_tracks = [self.__tracks_by_id[track_id] for _, _, track_id in self.__leaderboard[:quantity]]
+        # Fill any remaining places with unreviewed tracks, in catalogue order.
+        for track in self.__tracks:
+            if len(top_tracks) >= quantity:
+                break
+            if track.track_id not in self.__review_counts:
+                top_tracks.append(track)
+        return top_tracks
+
+    def get_entity_version(self, entity) -> int:
+        return self.__entity_versions[entity]
+
+    def get_leaderboard_version(self) -> int:
+        return self.__leaderboard_version
 
     def get_reviews(self):
         return self.__reviews
 
     def get_number_of_users(self):
         return len(self.__users)
-
@@ -1,13 +1,16 @@
 from sqlalchemy import (
     Table, MetaData, Column, Integer, String, Date, DateTime,
-    ForeignKey
+    ForeignKey, Index, DDL, event, table, column
 )
 from sqlalchemy.orm import mapper, relationship, synonym
+from sqlalchemy.orm.instrumentation import ClassManager
+from sqlalchemy.ext.instrumentation import InstrumentationManager
 
 from music.domainmodel.artist import Artist
 from music.domainmodel.album import Album
 from music.domainmodel.track import Track, Review, User
 from music.domainmodel.genre import Genre
+from music.adapters.repository import SEARCH_FIELD_WEIGHTS
 
 # global variable giving access to the MetaData (schema) information of the database
 metadata = MetaData()
@@ -22,8 +25,8 @@ users_table = Table(
 reviews_table = Table(
     'reviews', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('track_id', ForeignKey('tracks.track_id')),
-    Column('user_id', ForeignKey('users.user_id')),
+    Column('track_id', ForeignKey('tracks.track_id'), index=True),
+    Column('user_id', ForeignKey('users.user_id'), index=True),
     Column('review_text', String(1024), nullable=False),
     Column('rating', Integer, nullable=True),
     Column('timestamp', DateTime, nullable=False),
@@ -35,9 +38,11 @@ tracks_table = Table(
     Column('track_id', Integer, primary_key=True),
     Column('track_duration', Integer, nullable=False),
     Column('title', String(255), nullable=False),
-    Column('artist_id', ForeignKey('artists.artist_id')),
-    Column('album_id', ForeignKey('albums.album_id')),
-    Column('track_url', String(255), nullable=False)
+    Column('artist_id', ForeignKey('artists.artist_id'), index=True),
+    Column('album_id', ForeignKey('albums.album_id'), index=True),
+    Column('track_url', String(255), nullable=False),
+    # Keyset pagination through the tracks under a letter, see SqlAlchemyRepository.get_tracks_page.
+    Index('ix_tracks_title_track_id', 'title', 'track_id')
 )
 
 artists_table = Table(
@@ -64,10 +69,40 @@ genres_table = Table(
 track_genres_table = Table(
     'track_genres', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('genre_id', Integer, ForeignKey('genres.genre_id')),
-    Column('track_id', Integer, ForeignKey('tracks.track_id'))
+    Column('genre_id', Integer, ForeignKey('genres.genre_id'), index=True),
+    Column('track_id', Integer, ForeignKey('tracks.track_id')),
+    # Also serves lookups by track_id alone, as its leading column.
+    Index('ix_track_genres_track_id_genre_id', 'track_id', 'genre_id', unique=True)
 )
 
+# Counters changed in the same transaction as whatever they count, so that every process sharing the database sees the
+# same versions (see SqlAlchemyRepository.get_entity_version). Rows are made when first changed.
+versions_table = Table(
+    'versions', metadata,
+    Column('name', String(64), primary_key=True),
+    Column('version', Integer, nullable=False)
+)
+
+# Full-text search index over each track's search_fields, its rowid being the track_id. An SQLite FTS5 virtual table,
+# so it is created and dropped along with the metadata rather than being one of its tables.
+tracks_search_table = table('tracks_search', column('rowid'), *(column(field) for field in SEARCH_FIELD_WEIGHTS))
+
+event.listen(metadata, 'after_create', DDL(
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS tracks_search USING fts5({', '.join(SEARCH_FIELD_WEIGHTS)}, "
+    f"tokenize='unicode61 remove_diacritics 0')").execute_if(dialect='sqlite'))
+event.listen(metadata, 'before_drop', DDL('DROP TABLE IF EXISTS tracks_search').execute_if(dialect='sqlite'))
+
+
+def create_schema(engine):
+    """ Creates whatever tables, indexes and search table of the schema the database lacks, leaving the rest (and their
+    rows) as they are. Databases made before an index or table was added to the schema get it this way; create_all on
+    its own only creates indexes along with a new table. """
+    metadata.create_all(engine)
+    for schema_table in metadata.sorted_tables:
+        for index in schema_table.indexes:
+            index.create(engine, checkfirst=True)
+
+
 # track_reviews_table = Table(
 #     'track_reviews', metadata,
 #     Column('id', Integer, primary_key=True, autoincrement=True),
@@ -76,7 +111,65 @@ track_genres_table = Table(
 # )
 
 
+class SlotsInstrumentationManager(InstrumentationManager):
+    """ Instruments domain classes that declare __slots__ and so have no per-instance __dict__.
+
+    Mapped attribute values are kept in the _sa_dict slot and the SQLAlchemy state in the _sa_instance_state slot. The
+    class attributes replaced while mapping (the slot descriptors and __init__) are put back by unregister, so that
+    clear_mappers leaves the domain classes usable without a database. """
+
+    def __init__(self, class_):
+        self.__originals = dict()
+
+    def install_descriptor(self, class_, key, inst):
+        self.__originals.setdefault(key, class_.__dict__.get(key))
+        setattr(class_, key, inst)
+
+    def uninstall_descriptor(self, class_, key):
+        original = self.__originals.pop(key, None)
+        if original is None:
+            delattr(class_, key)
+        else:
+            setattr(class_, key, original)
+
+    install_member = install_descriptor
+    uninstall_member = uninstall_descriptor
+
+    def unregister(self, class_, manager):
+        # The default ClassManager teardown is skipped for custom managers; run it to uninstrument the attributes.
+        ClassManager.unregister(manager)
+        for key in list(self.__originals):
+            self.uninstall_member(class_, key)
+        super().unregister(class_, manager)
+
+    def install_state(self, class_, instance, state):
+        instance._sa_instance_state = state
+
+    def remove_state(self, class_, instance):
+        del instance._sa_instance_state
+
+    def state_getter(self, class_):
+        return lambda instance: instance._sa_instance_state
+
+    def initialize_instance_dict(self, class_, instance):
+        instance._sa_dict = dict()
+
+    def get_instance_dict(self, class_, instance):
+        try:
+            return instance._sa_dict
+        except AttributeError:
+            instance._sa_dict = dict()
+            return instance._sa_dict
+
+    def dict_getter(self, class_):
+        return lambda instance: self.get_instance_dict(class_, instance)
+
+
 def map_model_to_tables():
+    # The domain classes use __slots__, so have SQLAlchemy keep its per-instance data in the slots reserved for it.
+    for domain_class in (User, Review, Track, Artist, Album, Genre):
+        domain_class.__sa_instrumentation_manager__ = SlotsInstrumentationManager
+
     mapper(User, users_table, properties={
         '_User__user_id': users_table.c.user_id,
         '_User__user_name': users_table.c.user_name,
@@ -0,0 +1,56 @@
+import heapq
+from bisect import bisect_left
+from itertools import islice
+
+
+class PrefixIndex:
+    """ Names kept sorted case-insensitively in flat arrays, so that the ones starting with a prefix are found by
+    bisection and read off in order.
+
+    Rather than inserting each added name into one array the size of the whole index, which is O(n) per name, names go
+    into a list of sorted runs whose sizes at least halve from one run to the next. An added name is a run of its own,
+    merged with the runs before it while they are no more than twice its size, so each name is merged O(log n) times
+    and there are O(log n) runs to look through.
+    """
+
+    def __init__(self, entries=()):
+        # Each run is a pair of parallel arrays: (lower-cased name, id) sort keys, and the (id, name) entries they
+        # stand for.
+        entries = sorted(entries, key=lambda entry: (entry[1].lower(), entry[0]))
+        self.__runs = []
+        if len(entries) > 0:
+            self.__runs.append(([(name.lower(), entry_id) for entry_id, name in entries], entries))
+
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self.__runs)
+
+    def add(self, entry_id, name: str):
+        key = (name.lower(), entry_id)
+        for keys, _ in self.__runs:
+            position = bisect_left(keys, key)
+            if position < len(keys) and keys[position] == key:
+                return
+        self.__runs.append(([key], [(entry_id, name)]))
+        while len(self.__runs) > 1 and len(self.__runs[-2][0]) <= 2 * len(self.__runs[-1][0]):
+            later_keys, later_entries = self.__runs.pop()
+            keys, entries = self.__runs.pop()
+            # Keys are unique, so the (key, entry) pairs sort by key alone; both runs are sorted already, which
+            # Python's sort finds and merges in linear time.
+            merged = sorted(zip(keys + later_keys, entries + later_entries))
+            self.__runs.append(([key for key, _ in merged], [entry for _, entry in merged]))
+
+    def starting_with(self, prefix: str, limit: int) -> list:
+        """ Returns up to limit (id, name) entries whose name starts with prefix, ignoring case, in name order. """
+        prefix = prefix.lower()
+        matches = heapq.merge(*(self.__matches(keys, entries, prefix, limit) for keys, entries in self.__runs))
+        return [entry for _, entry in islice(matches, limit)]
+
+    @staticmethod
+    def __matches(keys: list, entries: list, prefix: str, limit: int):
+        # (key, entry) for up to limit names of a run starting with prefix, in order. (prefix,) sorts just before the
+        # first (name, id) key with a name from prefix onwards.
+        position = bisect_left(keys, (prefix,))
+        end = min(position + limit, len(keys))
+        while position < end and keys[position][0].startswith(prefix):
+            yield keys[position], entries[position]
+            position += 1
@@ -1,4 +1,6 @@
 import abc
+import re
+import string
 
 from music.domainmodel.track import Track, Review, User
 from music.domainmodel.album import Album
@@ -8,6 +10,41 @@ from music.domainmodel.genre import Genre
 
 repo_instance = None
 
+# Letters used to browse tracks, artists and albums alphabetically, in display order.
+ALPHABET = list(string.ascii_uppercase) + ['Other']
+
+
+def alphabet_letter(name: str) -> str:
+    """ Returns the browsing letter for name: its upper-cased first letter, or 'Other'. """
+    if name and name[0].upper() in string.ascii_uppercase:
+        return name[0].upper()
+    return 'Other'
+
+
+# How much a search word found in each searchable field of a track counts towards the track's rank.
+SEARCH_FIELD_WEIGHTS = {'title': 3.0, 'artist': 2.0, 'album': 1.0, 'genres': 1.0}
+
+
+def search_terms(text: str) -> list:
+    """ Splits text into the lower-cased words (runs of letters and digits) that search matches on. """
+    return re.findall(r'[^\W_]+', text.lower()) if text else []
+
+
+def search_fields(track: Track) -> dict:
+    """ Returns the searchable text of track, by field name (see SEARCH_FIELD_WEIGHTS). """
+    return {
+        'title': track.title or '',
+        'artist': (track.artist.full_name or '') if track.artist is not None else '',
+        'album': (track.album.title or '') if track.album is not None else '',
+        'genres': ' '.join(genre.name for genre in track.genres if genre.name is not None),
+    }
+
+
+# Loading profiles for the track listing methods: the Track relationships the caller is going to use for every track
+# it gets back. A database backed repository loads these along with the listing instead of one query per track.
+TRACK_SUMMARY = ('artist', 'album')
+TRACK_DETAILS = ('artist', 'album', 'genres', 'reviews')
+
 
 class RepositoryException(Exception):
 
@@ -18,7 +55,10 @@ class RepositoryException(Exception):
 class AbstractRepository(abc.ABC):
     @abc.abstractmethod
     def add_user(self, user: User):
-        """" Adds a User to the repository. """
+        """" Adds a User to the repository.
+
+        A User created without a user id is given the next free one when it is added.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -42,6 +82,51 @@ class AbstractRepository(abc.ABC):
         """ Gets all Albums """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_tracks_by_letter(self, letter: str, offset: int = 0, limit: int = None, load: tuple = ()) -> list:
+        """ Returns the Tracks whose title falls under letter (see alphabet_letter), sorted by title.
+
+        Only the tracks from offset onwards are returned, at most limit of them when limit is given. load is a loading
+        profile, such as TRACK_SUMMARY, naming the relationships to load with the tracks.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_tracks_page(self, first_letter: str, after_title: str = None, limit: int = 45, after_track_id: int = None,
+                        load: tuple = ()) -> list:
+        """ Returns a page of up to limit Tracks under first_letter, in (title, track id) order.
+
+        The page starts right after the track with after_title and after_track_id, which is usually the last track of
+        the previous page, or at the start of the letter when after_title is None. When after_track_id is None, every
+        track titled after_title is skipped.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_track_letter_counts(self) -> dict:
+        """ Returns a dict mapping every letter in ALPHABET to the number of Tracks under it. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_artists_by_letter(self, letter: str, offset: int = 0, limit: int = None) -> list:
+        """ Returns the Artists whose full name falls under letter, sorted by full name. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_artist_letter_counts(self) -> dict:
+        """ Returns a dict mapping every letter in ALPHABET to the number of Artists under it. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_albums_by_letter(self, letter: str, offset: int = 0, limit: int = None) -> list:
+        """ Returns the Albums whose title falls under letter, sorted by title. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_album_letter_counts(self) -> dict:
+        """ Returns a dict mapping every letter in ALPHABET to the number of Albums under it. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_track_by_id(self, track_id):
         """ Gets specific track based on track_id """
@@ -62,6 +147,22 @@ class AbstractRepository(abc.ABC):
         """ Gets specific genre based on genre_id """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_tracks_for_artist(self, artist_id, load: tuple = ()) -> list:
+        """ Returns the Tracks by the given artist, sorted by title, loading the relationships named in load. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_tracks_for_album(self, album_id, load: tuple = ()) -> list:
+        """ Returns the Tracks in the given album, sorted by title, loading the relationships named in load. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_tracks_for_genre(self, genre_id, load: tuple = ()) -> list:
+        """ Returns the Tracks tagged with the given genre, sorted by title, loading the relationships named in load.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_track(self, track: Track):
         """ Adds a Track to the repository. """
@@ -82,6 +183,20 @@ class AbstractRepository(abc.ABC):
         """ Adds a genre to the repository. """
         raise NotImplementedError
 
+    def add_catalogue(self, tracks, artists, albums, genres):
+        """ Adds a whole catalogue of Tracks with their Artists, Albums and Genres to the repository.
+
+        Repositories that can store many entities more cheaply than one at a time should override this.
+        """
+        for artist in artists:
+            self.add_artist(artist)
+        for album in albums:
+            self.add_album(album)
+        for genre in genres:
+            self.add_genre(genre)
+        for track in tracks:
+            self.add_track(track)
+
     @abc.abstractmethod
     def get_number_of_tracks(self) -> int:
         """ Returns the number of Tracks in the repository. """
@@ -99,6 +214,76 @@ class AbstractRepository(abc.ABC):
         if review.reviewer is None:
             raise RepositoryException('review not correctly attached to a User')
 
+    @abc.abstractmethod
+    def search_tracks(self, query: str, limit: int = 45) -> list:
+        """ Returns up to limit Tracks matching every word of query (see search_terms), best matches first.
+
+        A word matches a Track when it appears in the track's title, its artist's full name, its album's title or the
+        name of one of its genres, with matches in the title counting the most. Returns an empty list for a query
+        without any words.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_name_suggestions(self, prefix: str, limit: int = 5) -> dict:
+        """ Returns the names of Tracks, Artists and Albums starting with prefix, ignoring case, for autocompletion.
+
+        The result maps 'tracks', 'artists' and 'albums' to lists of up to limit (id, name) pairs each, in name order.
+        Suggestions come from a prefix index held in memory, without querying any database.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def fuzzy_search(self, query: str, limit: int = 10) -> dict:
+        """ Returns the names of the Tracks, Artists and Albums most like query, tolerating misspellings.
+
+        The result maps 'tracks', 'artists' and 'albums' to lists of up to limit (id, name) pairs each, most similar
+        first, as ranked by a character trigram index (see trigram_index.TrigramIndex).
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_similar_tracks(self, track_id, k: int = 5, load: tuple = ()) -> list:
+        """ Returns up to k Tracks with genres most like those of the Track with track_id, most similar first.
+
+        Similarity is the cosine similarity of the tracks' genre vectors, looked up in a precomputed index (see
+        similarity_index.GenreSimilarityIndex), which keeps at most GenreSimilarityIndex.KEPT tracks per track.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_co_reviewed_tracks(self, track_id, k: int = 5, load: tuple = ()) -> list:
+        """ Returns up to k other Tracks reviewed by the most Users who also reviewed the Track with track_id, most
+        first ("users who reviewed this also reviewed").
+
+        Counts come from a co-review matrix (see co_review_matrix.CoReviewMatrix) that is kept up to date with the
+        reviews added.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_top_tracks(self, quantity: int, load: tuple = ()) -> list:
+        """ Returns up to quantity Tracks, ordered by their number of Reviews (most reviewed first).
+
+        load is a loading profile, such as TRACK_SUMMARY, naming the relationships to load with the tracks.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_entity_version(self, entity) -> int:
+        """ Returns a number that changes whenever Entities of the class entity (Track, Artist, Album, Genre or
+        Review) are added or replaced, for caching what is made from them. A repository whose data is shared by several
+        processes gives the same version in each. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_leaderboard_version(self) -> int:
+        """ Returns a number that changes whenever get_top_tracks may return something different, for caching what is
+        made from the top tracks. add_review changes it, and so does adding tracks, as unreviewed tracks fill the
+        places left over. A repository whose data is shared by several processes gives the same version in each.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_reviews(self):
         """ Returns the Reviews stored in the repository. """
@@ -7,8 +7,9 @@ from music.tracks import services as track_services
 from music.domainmodel.track import Review, Track
 
 
-def populate(data_path: Path, repo: AbstractRepository, database_mode: bool):
-    reader = TrackCSVReader()
+def populate(data_path: Path, repo: AbstractRepository, database_mode: bool, use_snapshot: bool = False,
+             processes: int = 1):
+    reader = TrackCSVReader(use_snapshot, processes)
     # Load tracks, albums and artists into the repository.
     reader.read_csv_files(data_path, repo, database_mode)
 
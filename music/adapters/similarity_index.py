@@ -0,0 +1,58 @@
+from collections import Counter, defaultdict
+from itertools import chain, islice
+from math import sqrt
+
+
+class GenreSimilarityIndex:
+    """ The tracks most similar to each track, precomputed from the cosine similarity of their genre vectors.
+
+    A track's genre vector has a 1 for each of its genres, so the similarity of two tracks is the number of genres they
+    share over the square root of the product of their numbers of genres. Tracks with the same set of genres have the
+    same vector, so the sparse products are worked out once per distinct set of genres rather than once per track,
+    going through only the sets that share a genre (genre -> sets postings). Looking up a track is then a dict lookup.
+    """
+
+    # Most similar tracks kept per track.
+    KEPT = 10
+
+    def __init__(self, track_genres=()):
+        # track_genres is an iterable of (track id, genre ids). Ties are broken by track id, lowest first.
+        tracks_by_genre_set = defaultdict(list)
+        for track_id, genre_ids in sorted(track_genres, key=lambda entry: entry[0]):
+            if len(genre_ids) > 0:
+                tracks_by_genre_set[frozenset(genre_ids)].append(track_id)
+        genre_sets = list(tracks_by_genre_set)
+
+        sets_by_genre = defaultdict(list)
+        for position, genre_set in enumerate(genre_sets):
+            for genre_id in genre_set:
+                sets_by_genre[genre_id].append(position)
+
+        # Position of each track's set of genres, and the most similar tracks to each set. One more than KEPT is kept,
+        # as a track's own entry is dropped when it is looked up.
+        self.__set_of_track = dict()
+        self.__similar_to_set = list()
+        for position, genre_set in enumerate(genre_sets):
+            for track_id in tracks_by_genre_set[genre_set]:
+                self.__set_of_track[track_id] = position
+            shared_counts = Counter(chain.from_iterable(sets_by_genre[genre_id] for genre_id in genre_set))
+            ranked = ((-shared / sqrt(len(genre_set) * len(genre_sets[other])), other)
+                      for other, shared in shared_counts.items())
+            similar = []
+            for _, other in sorted(ranked):
+                similar.extend(tracks_by_genre_set[genre_sets[other]][:self.KEPT + 1 - len(similar)])
+                if len(similar) > self.KEPT:
+                    break
+            self.__similar_to_set.append(similar)
+
+    def __len__(self):
+        return len(self.__set_of_track)
+
+    def most_similar(self, track_id, limit: int) -> list:
+        """ Returns the ids of up to limit (at most KEPT) tracks most similar to track_id, most similar first. Tracks
+        without genres have no similar tracks. """
+        position = self.__set_of_track.get(track_id)
+        if position is None:
+            return []
+        similar = (other_id for other_id in self.__similar_to_set[position] if other_id != track_id)
+        return list(islice(similar, min(limit, self.KEPT)))
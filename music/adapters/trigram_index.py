@@ -0,0 +1,59 @@
+import heapq
+from collections import Counter, defaultdict
+from itertools import chain
+
+from music.adapters.repository import search_terms
+
+
+def trigrams(text: str) -> set:
+    """ The character trigrams of each word of text, padded like PostgreSQL's pg_trgm with two spaces before the word
+    and one after, so that word starts weigh the most. """
+    grams = set()
+    for word in search_terms(text):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """ Names indexed by their character trigrams, for finding the names most like a possibly misspelt query without
+    comparing it against every name. """
+
+    # Smallest similarity worth returning, as in pg_trgm.
+    SIMILARITY_THRESHOLD = 0.3
+
+    def __init__(self, entries=()):
+        self.__names = dict()
+        # id -> number of distinct trigrams in the name, and trigram -> ids of the names containing it.
+        self.__trigram_counts = dict()
+        self.__postings = defaultdict(list)
+        for entry_id, name in entries:
+            self.add(entry_id, name)
+
+    def __len__(self):
+        return len(self.__names)
+
+    def add(self, entry_id, name: str):
+        if entry_id in self.__names:
+            return
+        grams = trigrams(name)
+        self.__names[entry_id] = name
+        self.__trigram_counts[entry_id] = len(grams)
+        for gram in grams:
+            self.__postings[gram].append(entry_id)
+
+    def most_similar(self, query: str, limit: int) -> list:
+        """ Returns up to limit (id, name) entries most similar to query, most similar first.
+
+        Similarity is the number of trigrams shared with the query over the number in either of them. Only names that
+        share a trigram with the query are looked at, and those below SIMILARITY_THRESHOLD are left out.
+        """
+        query_grams = trigrams(query)
+        shared_counts = Counter(chain.from_iterable(self.__postings.get(gram, ()) for gram in query_grams))
+
+        ranked = []
+        for entry_id, shared in shared_counts.items():
+            similarity = shared / (len(query_grams) + self.__trigram_counts[entry_id] - shared)
+            if similarity >= self.SIMILARITY_THRESHOLD:
+                ranked.append((-similarity, self.__names[entry_id].lower(), entry_id))
+        return [(entry_id, self.__names[entry_id]) for _, _, entry_id in heapq.nsmallest(limit, ranked)]
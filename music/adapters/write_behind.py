@@ -0,0 +1,85 @@
+import queue
+import threading
+
+# Put on the queue by close, after everything still to be written.
+_CLOSE = object()
+
+
+class WriteBehindQueue:
+    """ Items accepted straight away and written later, in batches, by a background worker thread.
+
+    Ordering: items are written in the order they were put, one batch after another. A batch is whatever has been put
+    while the previous batch was being written, up to batch_size items, so writes are grouped under load without
+    holding back an item when there is nothing else to write.
+
+    Durability: an item is only stored once write_batch has returned for its batch. Items still queued when the process
+    dies are lost; flush waits until everything put so far has been written.
+
+    Shutdown: close stops the queue taking new items, writes every item already put, and waits for the worker to end.
+
+    Failures: if write_batch raises, the batch's items are written again one at a time, so that one bad item doesn't
+    lose the others. Items that still can't be written are passed to on_error with the exception, and dropped.
+    """
+
+    def __init__(self, write_batch, batch_size: int = 100, on_error=None):
+        self.__write_batch = write_batch
+        self.__batch_size = batch_size
+        self.__on_error = on_error
+        self.__queue = queue.Queue()
+        # Number of items put but not yet written (or dropped), guarded by the condition.
+        self.__unwritten = 0
+        self.__written = threading.Condition()
+        self.__closed = False
+        self.__worker = threading.Thread(target=self.__run, name='write-behind', daemon=True)
+        self.__worker.start()
+
+    def put(self, item):
+        with self.__written:
+            if self.__closed:
+                raise RuntimeError('The write-behind queue is closed')
+            self.__unwritten += 1
+            self.__queue.put(item)
+
+    def flush(self, timeout: float = None) -> bool:
+        """ Waits until every item put so far has been written, or for timeout seconds. Returns whether they were. """
+        with self.__written:
+            return self.__written.wait_for(lambda: self.__unwritten == 0, timeout)
+
+    def close(self):
+        with self.__written:
+            if self.__closed:
+                return
+            self.__closed = True
+            self.__queue.put(_CLOSE)
+        self.__worker.join()
+
+    def __run(self):
+        while True:
+            batch = [self.__queue.get()]
+            while batch[-1] is not _CLOSE and len(batch) < self.__batch_size:
+                try:
+                    batch.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = batch[-1] is _CLOSE
+            if closing:
+                batch.pop()
+            if len(batch) > 0:
+                self.__write(batch)
+            if closing:
+                return
+
+    def __write(self, batch: list):
+        try:
+            self.__write_batch(batch)
+        except Exception:
+            for item in batch:
+                try:
+                    self.__write_batch([item])
+                except Exception as e:
+                    if self.__on_error is not None:
+                        self.__on_error(item, e)
+        finally:
+            with self.__written:
+                self.__unwritten -= len(batch)
+                self.__written.notify_all()
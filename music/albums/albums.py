@@ -1,8 +1,12 @@
 from flask import request, render_template, redirect, url_for, session, Blueprint
 
+import music.adapters.cache as cache
 import music.adapters.repository as repo
 import music.albums.services as services
+from music.domainmodel.album import Album
+from music.domainmodel.track import Track
 from music.utilities import utilities
+from music.utilities.response_cache import cached_response
 
 # Configure Blueprint.
 albums_blueprint = Blueprint(
@@ -10,9 +14,8 @@ albums_blueprint = Blueprint(
 
 
 @albums_blueprint.route('/browse_albums_alphabetical', methods=['GET'])
+@cached_response(Album)
 def browse_albums_alphabetical_order():
-    albums_alphabet_dict = services.get_albums_by_alphabetical_order(repo.repo_instance)
-
     cursor = request.args.get('cursor')
 
     if cursor is None:
@@ -30,10 +33,14 @@ def browse_albums_alphabetical_order():
         # Convert cursor from string to int.
         cursor2 = int(cursor2)
 
-    return render_template('albums/simple_album.html', cursor=cursor, cursor2=cursor2, albums=albums_alphabet_dict[cursor], selected_tracks=utilities.get_top_tracks(), dict=albums_alphabet_dict, albums_per_page=albums_per_page)
+    albums, letter_counts = services.get_albums_page_by_letter(repo.repo_instance, cursor, cursor2, albums_per_page,
+                                                                 cache.cache_instance)
+
+    return render_template('albums/simple_album.html', cursor=cursor, cursor2=cursor2, albums=albums, number_of_albums=letter_counts[cursor], sidebar=utilities.get_sidebar(), dict=letter_counts, albums_per_page=albums_per_page)
 
 
 @albums_blueprint.route('/display_album_info', methods=['GET'])
+@cached_response(Album, Track)
 def display_album_info():
     album_id = request.args.get('album_id')
 
@@ -41,5 +48,5 @@ def display_album_info():
 
     tracks_in_chosen_album = services.get_tracks_in_album(repo.repo_instance, chosen_album)
 
-    return render_template('albums/album_info.html', album=chosen_album, album_id=album_id, selected_tracks=utilities.get_top_tracks(), tracks=tracks_in_chosen_album)
+    return render_template('albums/album_info.html', album=chosen_album, album_id=album_id, sidebar=utilities.get_sidebar(), tracks=tracks_in_chosen_album)
 
@@ -1,6 +1,6 @@
-import string
-
-from music.adapters.repository import AbstractRepository
+from music.adapters.cache import AbstractCache
+from music.adapters.repository import AbstractRepository, ALPHABET
+from music.domainmodel.album import Album
 
 
 class NonExistentAlbumException(Exception):
@@ -15,26 +15,19 @@ def get_album_by_id(repo: AbstractRepository, album_id):
 
 
 def get_albums_by_alphabetical_order(repo: AbstractRepository):
-
-    alphabet_dict = {k: [] for k in string.ascii_uppercase}
-    alphabet_dict['Other'] = []
-    for album in repo.get_albums():
-        if album.title[0].isalpha():
-            alphabet_dict[album.title[0].upper()].append(album)
-        else:
-            alphabet_dict['Other'].append(album)
-    for value in alphabet_dict.values():
-        value.sort(key=lambda x: x.title, reverse=False)
-    return alphabet_dict
+    return {letter: repo.get_albums_by_letter(letter) for letter in ALPHABET}
 
 
-def get_tracks_in_album(repo: AbstractRepository, chosen_album):
+def get_albums_page_by_letter(repo: AbstractRepository, letter: str, start: int, albums_per_page: int,
+                              cache: AbstractCache = None):
+    albums = repo.get_albums_by_letter(letter, start, albums_per_page)
+    if cache is None:
+        return albums, repo.get_album_letter_counts()
+    # Counting the albums under every letter goes through all of them, so the counts are shared through the cache,
+    # under a key that changes when albums are added.
+    return albums, cache.get_or_set(f'album_letter_counts:{repo.get_entity_version(Album)}',
+                                    repo.get_album_letter_counts)
 
-    tracks_in_album = []
-    for track in repo.get_tracks():
-        if track.album is not None:
-            if track.album.album_id == chosen_album.album_id:
-                tracks_in_album.append(track)
 
-    tracks_in_album.sort(key=lambda x: x.title, reverse=False)
-    return tracks_in_album
+def get_tracks_in_album(repo: AbstractRepository, chosen_album):
+    return repo.get_tracks_for_album(chosen_album.album_id)
@@ -1,8 +1,12 @@
 from flask import request, render_template, redirect, url_for, session, Blueprint
 
+import music.adapters.cache as cache
 import music.adapters.repository as repo
 import music.artists.services as services
+from music.domainmodel.artist import Artist
+from music.domainmodel.track import Track
 from music.utilities import utilities
+from music.utilities.response_cache import cached_response
 
 # Configure Blueprint.
 artists_blueprint = Blueprint(
@@ -10,9 +14,8 @@ artists_blueprint = Blueprint(
 
 
 @artists_blueprint.route('/browse_artists_alphabetical', methods=['GET'])
+@cached_response(Artist)
 def browse_artists_alphabetical_order():
-    artists_alphabet_dict = services.get_artists_by_alphabetical_order(repo.repo_instance)
-
     cursor = request.args.get('cursor')
 
     if cursor is None:
@@ -30,10 +33,14 @@ def browse_artists_alphabetical_order():
         # Convert cursor from string to int.
         cursor2 = int(cursor2)
 
-    return render_template('artists/simple_artist.html', cursor=cursor, cursor2=cursor2, artists=artists_alphabet_dict[cursor], selected_tracks=utilities.get_top_tracks(), dict=artists_alphabet_dict, artists_per_page=artists_per_page)
+    artists, letter_counts = services.get_artists_page_by_letter(repo.repo_instance, cursor, cursor2, artists_per_page,
+                                                                   cache.cache_instance)
+
+    return render_template('artists/simple_artist.html', cursor=cursor, cursor2=cursor2, artists=artists, number_of_artists=letter_counts[cursor], sidebar=utilities.get_sidebar(), dict=letter_counts, artists_per_page=artists_per_page)
 
 
 @artists_blueprint.route('/display_artist_info', methods=['GET'])
+@cached_response(Artist, Track)
 def display_artist_info():
     artist_id = request.args.get('artist_id')
 
@@ -41,5 +48,5 @@ def display_artist_info():
 
     tracks_by_chosen_artist = services.get_tracks_by_artist(repo.repo_instance, chosen_artist)
 
-    return render_template('artists/artist_info.html', artist=chosen_artist, artist_id=artist_id, selected_tracks=utilities.get_top_tracks(), tracks=tracks_by_chosen_artist)
+    return render_template('artists/artist_info.html', artist=chosen_artist, artist_id=artist_id, sidebar=utilities.get_sidebar(), tracks=tracks_by_chosen_artist)
 
@@ -1,6 +1,6 @@
-import string
-
-from music.adapters.repository import AbstractRepository
+from music.adapters.cache import AbstractCache
+from music.adapters.repository import AbstractRepository, ALPHABET
+from music.domainmodel.artist import Artist
 
 
 class NonExistentArtistException(Exception):
@@ -8,17 +8,18 @@ class NonExistentArtistException(Exception):
 
 
 def get_artists_by_alphabetical_order(repo: AbstractRepository):
+    return {letter: repo.get_artists_by_letter(letter) for letter in ALPHABET}
+
 
-    alphabet_dict = {k: [] for k in string.ascii_uppercase}
-    alphabet_dict['Other'] = []
-    for artist in repo.get_artists():
-        if artist.full_name[0].isalpha():
-            alphabet_dict[artist.full_name[0].upper()].append(artist)
-        else:
-            alphabet_dict['Other'].append(artist)
-    for value in alphabet_dict.values():
-        value.sort(key=lambda x: x.full_name, reverse=False)
-    return alphabet_dict
+def get_artists_page_by_letter(repo: AbstractRepository, letter: str, start: int, artists_per_page: int,
+                               cache: AbstractCache = None):
+    artists = repo.get_artists_by_letter(letter, start, artists_per_page)
+    if cache is None:
+        return artists, repo.get_artist_letter_counts()
+    # Counting the artists under every letter goes through all of them, so the counts are shared through the cache,
+    # under a key that changes when artists are added.
+    return artists, cache.get_or_set(f'artist_letter_counts:{repo.get_entity_version(Artist)}',
+                                     repo.get_artist_letter_counts)
 
 
 def get_artist_by_id(repo: AbstractRepository, artist_id):
@@ -29,11 +30,4 @@ def get_artist_by_id(repo: AbstractRepository, artist_id):
 
 
 def get_tracks_by_artist(repo: AbstractRepository, chosen_artist):
-
-    tracks_by_artist = []
-    for track in repo.get_tracks():
-        if track.artist.artist_id == chosen_artist.artist_id:
-            tracks_by_artist.append(track)
-
-    tracks_by_artist.sort(key=lambda x: x.title, reverse=False)
-    return tracks_by_artist
+    return repo.get_tracks_for_artist(chosen_artist.artist_id)
@@ -7,17 +7,22 @@ from password_validator import PasswordValidator
 
 from functools import wraps
 import music.authentication.services as services
+import music.authentication.password_hasher as password_hasher
 import music.adapters.repository as repo
 from music.utilities import utilities
 
 auth = Blueprint('authentication', __name__)
 
+# Shown, with a 503 Service Unavailable status, when too many passwords are already waiting to be hashed.
+BUSY_MESSAGE = 'Too many people are logging in right now - please try again in a moment'
+
 
 @auth.route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm()
     user_name_not_recognised = None
     password_does_not_match_user_name = None
+    status = 200
     if form.validate_on_submit():
         # Successful POST, i.e. the user name and password have passed validation checking.
         # Use the service layer to lookup the user.
@@ -25,7 +30,8 @@ def login():
             user = services.get_user(form.user_name.data, repo.repo_instance)
 
             # Authenticate user.
-            services.authenticate_user(user['user_name'], form.password.data, repo.repo_instance)
+            services.authenticate_user(user['user_name'], form.password.data, repo.repo_instance,
+                                       password_hasher.hasher_instance)
 
             # Initialise session and redirect the user to the home page.
             session.clear()
@@ -39,12 +45,17 @@ def login():
         except services.AuthenticationException:
             # Authentication failed, set a suitable error message.
             password_does_not_match_user_name = 'Password does not match supplied user name - please check and try again'
+
+        except password_hasher.HasherBusyException:
+            # Too many passwords are waiting to be checked, turn the user away rather than queue them up too.
+            password_does_not_match_user_name = BUSY_MESSAGE
+            status = 503
     return render_template('authentication/credentials.html',
                            title='Login',
                            user_name_error_message=user_name_not_recognised,
                            password_error_message=password_does_not_match_user_name,
-                           selected_tracks=utilities.get_top_tracks(),
-                           form=form)
+                           sidebar=utilities.get_sidebar(),
+                           form=form), status
 
 
 @auth.route('/logout')
@@ -57,25 +68,32 @@ def logout():
 def register():
     form = RegistrationForm()
     user_name_not_unique = None
+    password_not_hashed = None
+    status = 200
     if form.validate_on_submit():
         # Successful POST, i.e. the user name and password have passed validation checking.
         # Use the service layer to attempt to add the new user.
         try:
-            services.add_user(form.user_name.data, form.password.data, repo.repo_instance)
+            services.add_user(form.user_name.data, form.password.data, repo.repo_instance,
+                              password_hasher.hasher_instance)
 
             # All is well, redirect the user to the login page.
             return redirect(url_for('authentication.login'))
         except services.NameNotUniqueException:
             user_name_not_unique = 'Your user name is already taken - please supply another'
+        except password_hasher.HasherBusyException:
+            password_not_hashed = BUSY_MESSAGE
+            status = 503
 
     return render_template(
         'authentication/credentials.html',
         title='Register',
         form=form,
         user_name_error_message=user_name_not_unique,
+        password_error_message=password_not_hashed,
         handler_url=url_for('authentication.register'),
-        selected_tracks=utilities.get_top_tracks()
-        )
+        sidebar=utilities.get_sidebar()
+        ), status
 
 
 def login_required(view):
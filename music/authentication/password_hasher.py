@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# The hasher used by the authentication services, set up by create_app.
+hasher_instance = None
+
+
+class HasherBusyException(Exception):
+    pass
+
+
+class PasswordHasher:
+    """ Hashes and checks passwords on a pool of worker threads, so that however many requests log in at once, at most
+    workers CPU cores are busy hashing (hashlib releases the GIL while it hashes) and the rest serve other requests.
+
+    At most max_queued passwords wait for a worker; more are turned away with a HasherBusyException rather than queued
+    up behind them. The work factor is the number of PBKDF2 iterations of new hashes; a hash is always checked with
+    the iterations it was made with, so changing it doesn't lock anyone out.
+    """
+
+    def __init__(self, workers: int = 2, max_queued: int = 16, iterations: int = 260000):
+        self.__workers = workers
+        self.__max_queued = max_queued
+        self.__method = f'pbkdf2:sha256:{iterations}'
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hasher')
+        # Counts for metrics, guarded by the lock. Submitted passwords are queued until a worker starts on them.
+        self.__lock = threading.Lock()
+        self.__queued = 0
+        self.__running = 0
+        self.__peak_queued = 0
+        self.__completed = 0
+        self.__rejected = 0
+
+    def hash(self, password: str) -> str:
+        return self.__run(generate_password_hash, password, self.__method)
+
+    def check(self, password_hash: str, password: str) -> bool:
+        return self.__run(check_password_hash, password_hash, password)
+
+    def metrics(self) -> dict:
+        """ Returns the number of passwords waiting for a worker and being hashed, the most that have waited at once,
+        and how many have been hashed and turned away. """
+        with self.__lock:
+            return {'workers': self.__workers, 'max_queued': self.__max_queued, 'queued': self.__queued,
+                    'running': self.__running, 'peak_queued': self.__peak_queued, 'completed': self.__completed,
+                    'rejected': self.__rejected}
+
+    def shutdown(self):
+        self.__executor.shutdown(wait=True)
+
+    def __run(self, function, *args):
+        with self.__lock:
+            if self.__queued + self.__running >= self.__workers + self.__max_queued:
+                self.__rejected += 1
+                raise HasherBusyException
+            self.__queued += 1
+            self.__peak_queued = max(self.__peak_queued, self.__queued)
+        try:
+            future = self.__executor.submit(self.__work, function, *args)
+        except Exception:
+            with self.__lock:
+                self.__queued -= 1
+            raise
+        return future.result()
+
+    def __work(self, function, *args):
+        with self.__lock:
+            self.__queued -= 1
+            self.__running += 1
+        try:
+            return function(*args)
+        finally:
+            with self.__lock:
+                self.__running -= 1
+                self.__completed += 1
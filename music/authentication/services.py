@@ -1,6 +1,7 @@
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from music.adapters.repository import AbstractRepository
+from music.authentication.password_hasher import PasswordHasher
 from music.domainmodel.track import User
 
 
@@ -16,18 +17,21 @@ class AuthenticationException(Exception):
     pass
 
 
-def add_user(user_name: str, password: str, repo: AbstractRepository):
+def add_user(user_name: str, password: str, repo: AbstractRepository, hasher: PasswordHasher = None):
     # Check that the given user name is available.
     user = repo.get_user(user_name)
     if user is not None:
         raise NameNotUniqueException
 
-    user_id = repo.get_number_of_users()
     # Encrypt password so that the database doesn't store passwords 'in the clear'.
-    password_hash = generate_password_hash(password)
-
-    # Create and store the new User, with password encrypted.
-    user = User(user_id, user_name, password_hash)
+    # Hashing is slow on purpose, so is done by the hasher's workers if there is a hasher.
+    if hasher is None:
+        password_hash = generate_password_hash(password)
+    else:
+        password_hash = hasher.hash(password)
+
+    # Create and store the new User, with password encrypted. The repository assigns the user id.
+    user = User(None, user_name, password_hash)
     repo.add_user(user)
 
 
@@ -39,12 +43,15 @@ def get_user(user_name: str, repo: AbstractRepository):
     return user_to_dict(user)
 
 
-def authenticate_user(user_name: str, password: str, repo: AbstractRepository):
+def authenticate_user(user_name: str, password: str, repo: AbstractRepository, hasher: PasswordHasher = None):
     authenticated = False
 
     user = repo.get_user(user_name)
     if user is not None:
-        authenticated = check_password_hash(user.password, password)
+        if hasher is None:
+            authenticated = check_password_hash(user.password, password)
+        else:
+            authenticated = hasher.check(user.password, password)
     if not authenticated:
         raise AuthenticationException
 
@@ -1,4 +1,7 @@
 class Album:
+    # No per-instance __dict__, see Track.__slots__.
+    __slots__ = ('__album_id', '__title', '__album_url', '__album_type', '__release_year', '_sa_instance_state',
+                 '_sa_dict', '__weakref__')
 
     def __init__(self, album_id: int, title: str):
         if type(album_id) is not int or album_id < 0:
@@ -1,4 +1,6 @@
 class Artist:
+    # No per-instance __dict__, see Track.__slots__.
+    __slots__ = ('__artist_id', '__full_name', '_sa_instance_state', '_sa_dict', '__weakref__')
 
     def __init__(self, artist_id: int, full_name: str):
         if type(artist_id) is not int or artist_id < 0:
@@ -1,4 +1,6 @@
 class Genre:
+    # No per-instance __dict__, see Track.__slots__.
+    __slots__ = ('__genre_id', '__name', '_sa_instance_state', '_sa_dict', '__weakref__')
 
     def __init__(self, genre_id: int, genre_name: str):
         if type(genre_id) is not int or genre_id < 0:
@@ -10,6 +10,12 @@ from music.domainmodel.album import Album
 
 
 class Track:
+    # Domain objects keep their attributes in fixed slots rather than a per-instance __dict__, which keeps a large
+    # in-memory catalogue small. _sa_instance_state and _sa_dict are only used when SQLAlchemy maps the class (see
+    # orm.SlotsInstrumentationManager), and __weakref__ lets SQLAlchemy's identity map refer to instances.
+    __slots__ = ('__track_id', '__title', '__artist', '__album', '__track_url', '__track_duration', '__genres',
+                 '__reviews', '_sa_instance_state', '_sa_dict', '__weakref__')
+
     def __init__(self, track_id: int, track_title: str):
         if type(track_id) is not int or track_id < 0:
             raise ValueError
@@ -127,6 +133,9 @@ class Track:
 
 
 class Review:
+    # No per-instance __dict__, see Track.__slots__.
+    __slots__ = ('__track', '__review_text', '__rating', '__timestamp', '__reviewer', '_sa_instance_state', '_sa_dict',
+                 '__weakref__')
 
     def __init__(self, track: Track, review_text: str, rating: int):
         self.__track = None
@@ -197,9 +206,13 @@ class Review:
 
 
 class User:
+    # No per-instance __dict__, see Track.__slots__.
+    __slots__ = ('__user_id', '__user_name', '__password', '__reviews', '__liked_tracks', '_sa_instance_state',
+                 '_sa_dict', '__weakref__')
 
     def __init__(self, user_id: int, user_name: str, password: str):
-        if type(user_id) is not int or user_id < 0:
+        # A user_id of None leaves the id to be assigned by the repository the User is added to.
+        if user_id is not None and (type(user_id) is not int or user_id < 0):
             raise ValueError("User ID should be a non negative integer.")
         self.__user_id = user_id
 
@@ -220,6 +233,15 @@ class User:
     def user_id(self) -> int:
         return self.__user_id
 
+    @user_id.setter
+    def user_id(self, new_user_id: int):
+        # Only for the repository to assign the id of a User created without one; a User's id never changes.
+        if self.__user_id is not None:
+            raise AttributeError("User ID can't be changed once assigned.")
+        if type(new_user_id) is not int or new_user_id < 0:
+            raise ValueError("User ID should be a non negative integer.")
+        self.__user_id = new_user_id
+
     @property
     def user_name(self) -> str:
         return self.__user_name
@@ -12,6 +12,6 @@ def home():
 
     return render_template(
         'home/home.html',
-        selected_tracks=utilities.get_top_tracks()
+        sidebar=utilities.get_sidebar()
     )
 
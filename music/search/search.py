@@ -0,0 +1,37 @@
+from flask import request, render_template, jsonify, Blueprint
+
+import music.adapters.repository as repo
+import music.search.services as services
+from music.utilities import utilities
+
+# Configure Blueprint.
+search_blueprint = Blueprint(
+    'search_bp', __name__)
+
+
+@search_blueprint.route('/search', methods=['GET'])
+def search():
+    query = request.args.get('q', '')
+
+    # Fuzzy mode tolerates misspellings, matching names that look like the query rather than containing its words.
+    fuzzy = request.args.get('mode') == 'fuzzy'
+
+    results_per_page = 45
+
+    if fuzzy:
+        matches = services.fuzzy_search(repo.repo_instance, query, results_per_page)
+        return render_template('search/search_results.html', query=query, fuzzy=True, tracks=matches['tracks'], artists=matches['artists'], albums=matches['albums'], sidebar=utilities.get_sidebar())
+
+    tracks = services.search_tracks(repo.repo_instance, query, results_per_page)
+
+    return render_template('search/search_results.html', query=query, fuzzy=False, tracks=tracks, sidebar=utilities.get_sidebar())
+
+
+@search_blueprint.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    prefix = request.args.get('q', '')
+
+    # Number of suggestions of each kind, capped so that a request can't ask for the whole catalogue.
+    suggestions_per_kind = max(0, min(request.args.get('k', 5, type=int), 20))
+
+    return jsonify(services.get_name_suggestions(repo.repo_instance, prefix, suggestions_per_kind))
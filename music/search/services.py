@@ -0,0 +1,18 @@
+from music.adapters.repository import AbstractRepository
+
+
+def search_tracks(repo: AbstractRepository, query: str, limit: int):
+    return repo.search_tracks(query, limit)
+
+
+def get_name_suggestions(repo: AbstractRepository, prefix: str, limit: int):
+    if prefix.strip() == '':
+        return {'tracks': [], 'artists': [], 'albums': []}
+    suggestions = repo.get_name_suggestions(prefix, limit)
+    return {kind: [{'id': entity_id, 'name': name} for entity_id, name in names] for kind, names in suggestions.items()}
+
+
+def fuzzy_search(repo: AbstractRepository, query: str, limit: int):
+    if query.strip() == '':
+        return {'tracks': [], 'artists': [], 'albums': []}
+    return repo.fuzzy_search(query, limit)
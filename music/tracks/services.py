@@ -1,9 +1,8 @@
-import string
-
 from music.domainmodel.track import Track, Review, make_comment
 
 
-from music.adapters.repository import AbstractRepository
+from music.adapters.cache import AbstractCache
+from music.adapters.repository import AbstractRepository, ALPHABET, TRACK_SUMMARY
 
 
 class NonExistentTrackException(Exception):
@@ -15,17 +14,22 @@ class UnknownUserException(Exception):
 
 
 def get_tracks_by_alphabetical_order(repo: AbstractRepository):
+    return {letter: repo.get_tracks_by_letter(letter) for letter in ALPHABET}
+
 
-    alphabet_dict = {k: [] for k in string.ascii_uppercase}
-    alphabet_dict['Other'] = []
-    for track in repo.get_tracks():
-        if track.title[0].isalpha():
-            alphabet_dict[track.title[0].upper()].append(track)
-        else:
-            alphabet_dict['Other'].append(track)
-    for value in alphabet_dict.values():
-        value.sort(key=lambda x: x.title, reverse=False)
-    return alphabet_dict
+def get_tracks_page_by_letter(repo: AbstractRepository, letter: str, start: int, tracks_per_page: int,
+                              after_title: str = None, after_track_id: int = None, cache: AbstractCache = None):
+    if start == 0 or after_title is not None:
+        tracks = repo.get_tracks_page(letter, after_title, tracks_per_page, after_track_id)
+    else:
+        # Going back a page, which the keyset of the last track shown can't do, so count through the letter instead.
+        tracks = repo.get_tracks_by_letter(letter, start, tracks_per_page)
+    if cache is None:
+        return tracks, repo.get_track_letter_counts()
+    # Counting the tracks under every letter goes through all of them, so the counts are shared through the cache,
+    # under a key that changes when tracks are added.
+    return tracks, cache.get_or_set(f'track_letter_counts:{repo.get_entity_version(Track)}',
+                                    repo.get_track_letter_counts)
 
 
 def get_track_by_id(repo: AbstractRepository, track_id):
@@ -35,6 +39,15 @@ def get_track_by_id(repo: AbstractRepository, track_id):
     return track
 
 
+def get_similar_tracks(repo: AbstractRepository, track_id, quantity: int = 5):
+    # Listed with their artists, so load those along with the tracks.
+    return repo.get_similar_tracks(track_id, quantity, load=TRACK_SUMMARY)
+
+
+def get_co_reviewed_tracks(repo: AbstractRepository, track_id, quantity: int = 5):
+    return repo.get_co_reviewed_tracks(track_id, quantity, load=TRACK_SUMMARY)
+
+
 def add_review(track_id: int, rating: int, review_text: str, user_name: str, repo: AbstractRepository):
 
     # Check that the track exists.
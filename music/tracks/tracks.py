@@ -5,12 +5,14 @@ from flask_wtf import FlaskForm
 from wtforms import TextAreaField, HiddenField, SubmitField, IntegerField, validators
 from wtforms.validators import DataRequired, Length, ValidationError
 
+import music.adapters.cache as cache
 import music.adapters.repository as repo
 import music.tracks.services as services
 
 from music.authentication.authentication import login_required
 from music.domainmodel.track import Track, Review, make_comment
 from music.utilities import utilities
+from music.utilities.response_cache import cached_response
 
 # Configure Blueprint.
 tracks_blueprint = Blueprint(
@@ -18,9 +20,8 @@ tracks_blueprint = Blueprint(
 
 
 @tracks_blueprint.route('/browse_tracks_alphabetical', methods=['GET'])
+@cached_response(Track)
 def browse_tracks_alphabetical_order():
-    tracks_alphabet_dict = services.get_tracks_by_alphabetical_order(repo.repo_instance)
-
     cursor = request.args.get('cursor')
 
     if cursor is None:
@@ -38,7 +39,14 @@ def browse_tracks_alphabetical_order():
         # Convert cursor from string to int.
         cursor2 = int(cursor2)
 
-    return render_template('tracks/simple_track.html', cursor=cursor, cursor2=cursor2, tracks=tracks_alphabet_dict[cursor], selected_tracks=utilities.get_top_tracks(), dict=tracks_alphabet_dict, tracks_per_page=tracks_per_page)
+    # Title and id of the last track on the previous page, when paging forwards.
+    after_title = request.args.get('after_title')
+    after_id = request.args.get('after_id', type=int)
+
+    tracks, letter_counts = services.get_tracks_page_by_letter(repo.repo_instance, cursor, cursor2, tracks_per_page,
+                                                               after_title, after_id, cache.cache_instance)
+
+    return render_template('tracks/simple_track.html', cursor=cursor, cursor2=cursor2, tracks=tracks, number_of_tracks=letter_counts[cursor], sidebar=utilities.get_sidebar(), dict=letter_counts, tracks_per_page=tracks_per_page)
 
 
 @tracks_blueprint.route('/display_track_info_comments', methods=['GET'])
@@ -59,10 +67,11 @@ def display_track_info_comments():
     add_comment_url = url_for('tracks_bp.review_track', track_id=chosen_track.track_id)
 
     return render_template('tracks/track_info_comments.html', track=chosen_track, view_comment_url=view_comment_url
-                           , add_comment_url=add_comment_url, track_id=track_id, selected_tracks=utilities.get_top_tracks())
+                           , add_comment_url=add_comment_url, track_id=track_id, sidebar=utilities.get_sidebar())
 
 
 @tracks_blueprint.route('/display_track_info', methods=['GET'])
+@cached_response(Track, Review)
 def display_track_info():
     track_id = request.args.get('track_id')
 
@@ -79,8 +88,12 @@ def display_track_info():
     view_comment_url = url_for('tracks_bp.display_track_info_comments', track_id=chosen_track.track_id)
     add_comment_url = url_for('tracks_bp.review_track', track_id=chosen_track.track_id)
 
+    similar_tracks = services.get_similar_tracks(repo.repo_instance, chosen_track.track_id)
+    co_reviewed_tracks = services.get_co_reviewed_tracks(repo.repo_instance, chosen_track.track_id)
+
     return render_template('tracks/track_info.html', track=chosen_track, view_comment_url=view_comment_url
-                           , add_comment_url=add_comment_url, track_id=track_id, selected_tracks=utilities.get_top_tracks())
+                           , add_comment_url=add_comment_url, track_id=track_id, similar_tracks=similar_tracks,
+                           co_reviewed_tracks=co_reviewed_tracks, sidebar=utilities.get_sidebar())
 
 
 @tracks_blueprint.route('/review', methods=['GET', 'POST'])
@@ -131,7 +144,7 @@ def review_track():
         form=form,
         handler_url=url_for('tracks_bp.review_track'),
         user_name=user_name,
-        selected_tracks=utilities.get_top_tracks()
+        sidebar=utilities.get_sidebar()
     )
 
 
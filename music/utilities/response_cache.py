@@ -0,0 +1,84 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+
+import music.adapters.repository as repo
+from music.adapters.cache import LocalCache
+
+
+class ResponseCache:
+    """ Rendered responses of read-only views, in a least recently used cache of at most size entries that each expire
+    ttl seconds after being rendered.
+
+    Entries are keyed by what the response was rendered for (path, query arguments and logged-in user) and stored with
+    the ETag of the repository state they were rendered from, so an entry is only served while its ETag is current.
+    """
+
+    def __init__(self, size: int = 256, ttl: float = 300):
+        # key -> (ETag, Last-Modified, body, mimetype).
+        self.__entries = LocalCache(size, ttl)
+
+    def __len__(self):
+        return len(self.__entries)
+
+    @staticmethod
+    def etag(key, versions) -> str:
+        # Made from nothing but the key and the versions, so every process serving the same repository gives the same
+        # ETag for the same page, and each can answer a conditional request for a page another one rendered.
+        return hashlib.sha1(repr((key, versions)).encode()).hexdigest()
+
+    def get(self, key, etag: str):
+        """ Returns the (ETag, Last-Modified, body, mimetype) entry for key if it has the given ETag and hasn't expired,
+        otherwise None. """
+        entry = self.__entries.get(key)
+        if entry is not None and entry[0] != etag:
+            self.__entries.delete(key)
+            return None
+        return entry
+
+    def put(self, key, etag: str, body: bytes, mimetype: str):
+        entry = (etag, datetime.now(timezone.utc).replace(microsecond=0), body, mimetype)
+        self.__entries.set(key, entry)
+        return entry
+
+
+def cached_response(*entities):
+    """ Caches the responses of a read-only view in the app's ResponseCache, and answers conditional requests.
+
+    entities are the domain classes whose Entities the view shows. The response's strong ETag is made from the
+    repository's version of each of them and its leaderboard version (for the sidebar), so it changes whenever the page
+    may, and a request whose If-None-Match has the current ETag gets a 304 without the view being called.
+    """
+    def decorator(view):
+        @wraps(view)
+        def cached_view(*args, **kwargs):
+            cache = current_app.extensions['response_cache']
+            key = (request.path, tuple(sorted(request.args.items(multi=True))), session.get('user_name'))
+            versions = (tuple(repo.repo_instance.get_entity_version(entity) for entity in entities),
+                        repo.repo_instance.get_leaderboard_version())
+            etag = cache.etag(key, versions)
+
+            if etag in request.if_none_match:
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+
+            entry = cache.get(key, etag)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                entry = cache.put(key, etag, response.get_data(), response.mimetype)
+
+            _, last_modified, body, mimetype = entry
+            response = current_app.response_class(body, mimetype=mimetype)
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            # The page shows who is logged in, and browsers should check the ETag before showing it again.
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
+        return cached_view
+    return decorator
@@ -1,7 +1,6 @@
-from music.adapters.repository import AbstractRepository
+from music.adapters.repository import AbstractRepository, TRACK_SUMMARY
 
 
-def sort_tracks_by_reviews(repo: AbstractRepository):
-
-    sorted_by_reviews = sorted(repo.get_tracks(), key=lambda x: len(x.reviews), reverse=True)
-    return sorted_by_reviews
+def get_top_tracks(repo: AbstractRepository, quantity: int):
+    # The sidebar shows each track's artist and album.
+    return repo.get_top_tracks(quantity, load=TRACK_SUMMARY)
@@ -1,4 +1,5 @@
 from flask import Blueprint, request, render_template, redirect, url_for, session
+from markupsafe import Markup
 
 import music.adapters.repository as repo
 import music.utilities.services as services
@@ -7,14 +8,21 @@ import music.utilities.services as services
 utilities_blueprint = Blueprint(
     'utilities_bp', __name__)
 
+# The last rendered Popular Tracks sidebar, as ((repository, leaderboard version), html).
+_sidebar_cache = (None, None)
+
 
 def get_top_tracks(quantity=15):
+    return services.get_top_tracks(repo.repo_instance, quantity)
 
-    sorted_tracks = services.sort_tracks_by_reviews(repo.repo_instance)
-    top_tracks = []
-    if quantity > len(sorted_tracks):
-        top_tracks = sorted_tracks[:]
-    else:
-        top_tracks = sorted_tracks[:quantity]
-    return top_tracks
 
+def get_sidebar():
+    """ The Popular Tracks sidebar as HTML, rendered only when the repository's leaderboard has changed since the last
+    time. """
+    global _sidebar_cache
+    key = (repo.repo_instance, repo.repo_instance.get_leaderboard_version())
+    cached_key, html = _sidebar_cache
+    if cached_key != key:
+        html = Markup(render_template('sidebar.html', selected_tracks=get_top_tracks()))
+        _sidebar_cache = (key, html)
+    return html
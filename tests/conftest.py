@@ -12,9 +12,9 @@ TEST_DATA_PATH = get_project_root() / "tests" / "data"
 
 @pytest.fixture
 def in_memory_repo():
-    data = TrackCSVReader(str(TEST_DATA_PATH) + "/raw_albums_excerpt.csv", str(TEST_DATA_PATH) + "/raw_tracks_excerpt.csv")
-    data.read_csv_files()
+    data = TrackCSVReader()
     repo = MemoryRepository(data)
+    data.read_csv_files(TEST_DATA_PATH, repo, False)
     return repo
 
 
@@ -1,7 +1,15 @@
+import time
+
 import pytest
 
 from flask import session
 
+import music.adapters.repository as repo
+from music.authentication import password_hasher
+from music.tracks import services as tracks_services
+from music.utilities import utilities
+from music.utilities.response_cache import ResponseCache
+
 
 def test_index(client):
     # Check that we can retrieve the home page.
@@ -10,6 +18,70 @@ def test_index(client):
     assert b'Spootify is a Web Application that assists users to discover and rediscover Music.' in response.data
 
 
+def test_sidebar_is_rendered_once_per_leaderboard_change(client, monkeypatch):
+    top_tracks_requests = []
+    get_top_tracks = utilities.get_top_tracks
+    monkeypatch.setattr(utilities, 'get_top_tracks', lambda: top_tracks_requests.append(1) or get_top_tracks())
+
+    first_page = client.get('/').data
+    assert b'Popular Tracks' in first_page
+    assert client.get('/').data == first_page
+    assert len(top_tracks_requests) == 1
+
+    # A new review may change the popular tracks, so the sidebar is rendered again.
+    tracks_services.add_review(10, 5, 'catchy', 'laptop', repo.repo_instance)
+    client.get('/')
+    assert len(top_tracks_requests) == 2
+
+
+def test_read_only_pages_are_cached_and_revalidated(client, monkeypatch):
+    response = client.get('/display_track_info?track_id=3')
+    assert response.status_code == 200
+    etag, _ = response.get_etag()
+    assert response.last_modified is not None
+
+    # The second visit is served from the response cache, without looking the track up again.
+    lookups = []
+    get_track_by_id = tracks_services.get_track_by_id
+    monkeypatch.setattr(tracks_services, 'get_track_by_id', lambda *args: lookups.append(1) or get_track_by_id(*args))
+    assert client.get('/display_track_info?track_id=3').data == response.data
+    assert lookups == []
+
+    # A visit with the current ETag gets a 304.
+    revalidated = client.get('/display_track_info?track_id=3', headers={'If-None-Match': f'"{etag}"'})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+    # Until a review is added.
+    tracks_services.add_review(3, 4, 'still great', 'notebook', repo.repo_instance)
+    first_page = response.data
+    response = client.get('/display_track_info?track_id=3', headers={'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+    assert response.data != first_page
+    assert lookups == [1]
+
+
+def test_response_cache_evicts_least_recently_used_and_expired_pages():
+    cache = ResponseCache(size=2, ttl=60)
+    for key in ('a', 'b'):
+        cache.put(key, cache.etag(key, 0), key.encode(), 'text/html')
+    cache.get('a', cache.etag('a', 0))
+    cache.put('c', cache.etag('c', 0), b'c', 'text/html')
+
+    assert cache.get('b', cache.etag('b', 0)) is None
+    assert cache.get('a', cache.etag('a', 0))[2] == b'a'
+    # An entry rendered for other versions isn't served.
+    assert cache.get('c', cache.etag('c', 1)) is None
+    # Workers sharing a database give a page the same ETag.
+    assert ResponseCache(size=2, ttl=60).etag('c', 0) == cache.etag('c', 0)
+
+    expired = ResponseCache(size=2, ttl=0)
+    expired.put('a', expired.etag('a', 0), b'a', 'text/html')
+    time.sleep(0.01)
+    assert expired.get('a', expired.etag('a', 0)) is None
+
+
 def test_track_with_review(client):
     # Check that we can retrieve the articles page.
     response = client.get('/display_track_info_comments?track_id=3')
@@ -47,6 +119,40 @@ def test_track_info(client):
     assert b'Electric Ave' in response.data
     assert b'AWOL' in response.data
 
+    # Other Hip-Hop tracks are suggested as similar ones.
+    assert b'Similar Tracks' in response.data
+    assert b'Food' in response.data
+
+
+def test_search(client):
+    # Check that searching by artist lists the artist's tracks.
+    response = client.get('/search?q=awol')
+    assert response.status_code == 200
+    assert b'Electric Ave' in response.data
+
+    response = client.get('/search?q=xyzzy')
+    assert b'No tracks found.' in response.data
+
+
+def test_fuzzy_search(client):
+    response = client.get('/search?q=electrik+avenue&mode=fuzzy')
+    assert response.status_code == 200
+    assert b'Electric Ave' in response.data
+
+
+def test_autocomplete(client):
+    response = client.get('/autocomplete?q=awo&k=2')
+    assert response.status_code == 200
+    assert response.json['artists'] == [{'id': 1, 'name': 'AWOL'}]
+    assert len(response.json['tracks']) <= 2
+
+
+def test_autocomplete_with_a_negative_number_of_suggestions(client):
+    response = client.get('/autocomplete?q=awo&k=-1')
+    assert response.status_code == 200
+    assert response.json['artists'] == []
+    assert response.json['tracks'] == []
+
 
 def test_register(client):
     # Check that we retrieve the register page.
@@ -61,6 +167,20 @@ def test_register(client):
     assert response.headers['Location'] == '/login'
 
 
+def test_login_is_turned_away_while_the_password_hasher_is_busy(client, monkeypatch):
+    client.post('/register', data={'user_name': 'gmichael', 'password': 'CarelessWhisper1984'})
+
+    def busy(password_hash, password):
+        raise password_hasher.HasherBusyException
+
+    monkeypatch.setattr(password_hasher.hasher_instance, 'check', busy)
+    with client:
+        response = client.post('/login', data={'user_name': 'gmichael', 'password': 'CarelessWhisper1984'})
+        assert response.status_code == 503
+        assert b'Too many people are logging in right now' in response.data
+        assert 'user_name' not in session
+
+
 @pytest.mark.parametrize(('user_name', 'password', 'message'), (
         ('', '', b'Your user name is required'),
         ('cj', '', b'Your user name is too short'),
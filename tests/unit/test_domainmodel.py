@@ -1,5 +1,9 @@
 import pytest
 import os
+import shutil
+import types
+
+from pathlib import Path
 
 from music.domainmodel.artist import Artist
 from music.domainmodel.track import Track
@@ -7,7 +11,10 @@ from music.domainmodel.genre import Genre
 from music.domainmodel.track import Review
 from music.domainmodel.album import Album
 from music.domainmodel.track import User
-from music.adapters.csvdatareader import TrackCSVReader
+from music.adapters.csvdatareader import (
+    TrackCSVReader, TRACK_COLUMNS, parse_genre_dicts, split_tracks_file, read_tracks_chunk
+)
+from music.adapters.memory_repository import MemoryRepository
 
 
 class TestArtist:
@@ -441,6 +448,20 @@ class TestTrack:
         track_set.discard(track3)
         assert len(track_set) == 0
 
+    def test_slots(self):
+        track = Track(1, 'Shivers')
+        track.artist = Artist(1, 'Ed Sheeran')
+        track.album = Album(1, '=')
+        track.add_genre(Genre(1, 'Pop'))
+        user = User(1, 'shyamli', 'pw12345')
+        review = Review(track, 'Great', 5)
+
+        # Domain objects have no per-instance __dict__, and so can't grow attributes outside their slots.
+        for entity in [track, track.artist, track.album, track.genres[0], user, review]:
+            assert not hasattr(entity, '__dict__')
+        with pytest.raises(AttributeError):
+            track.tempo = 120
+
 
 class TestReview:
 
@@ -573,6 +594,17 @@ class TestUser:
         with pytest.raises(AttributeError):
             user1.password = 'asdfe'
 
+    def test_user_id_can_be_assigned_once(self):
+        user1 = User(None, 'leorose', 'LEOROSE277')
+
+        with pytest.raises(ValueError):
+            user1.user_id = -1
+        user1.user_id = 12
+        assert user1.user_id == 12
+
+        with pytest.raises(AttributeError):
+            user1.user_id = 13
+
     def test_equality(self):
         user1 = User(2231, 'amotys', 'amotys277')
         user1_copy = User(2231, 'amotys', 'amotys277')
@@ -677,10 +709,8 @@ class TestUser:
 
 def create_csv_reader():
     dirname = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    albums_file_name = os.path.join(dirname, 'data/raw_albums_excerpt.csv')
-    tracks_file_name = os.path.join(dirname, 'data/raw_tracks_excerpt.csv')
-    reader = TrackCSVReader(albums_file_name, tracks_file_name)
-    reader.read_csv_files()
+    reader = TrackCSVReader()
+    reader.read_csv_files(Path(dirname) / 'data', MemoryRepository(reader), False)
     return reader
 
 
@@ -746,3 +776,99 @@ class TestCSVReader:
         sorted_genre_sample = str(sorted_genres[:3])
         assert sorted_genre_sample == '[<Genre Avant-Garde, genre id = 1>, <Genre International, genre id = 2>, <Genre Blues, genre id = 3>]'
 
+    def test_tracks_file_is_streamed_with_only_used_columns(self):
+        dirname = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        track_rows = TrackCSVReader().read_tracks_file(dirname / 'data')
+
+        first_row = next(track_rows)
+
+        assert isinstance(track_rows, types.GeneratorType)
+        assert set(first_row.keys()) == set(TRACK_COLUMNS)
+        assert first_row['track_title'] == 'Food'
+        assert sum(1 for _ in track_rows) == 1999
+
+    def test_parallel_reading_matches_sequential_reading(self):
+        dirname = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        reader = create_csv_reader()
+        parallel_reader = TrackCSVReader(processes=3)
+        parallel_reader.read_csv_files(dirname / 'data', MemoryRepository(parallel_reader), False)
+
+        assert parallel_reader.dataset_of_tracks == reader.dataset_of_tracks
+        assert parallel_reader.dataset_of_artists == reader.dataset_of_artists
+        assert parallel_reader.dataset_of_albums == reader.dataset_of_albums
+        assert parallel_reader.dataset_of_genres == reader.dataset_of_genres
+        for track, parallel_track in zip(reader.dataset_of_tracks, parallel_reader.dataset_of_tracks):
+            assert parallel_track.title == track.title
+            assert parallel_track.track_duration == track.track_duration
+            assert parallel_track.artist == track.artist
+            assert parallel_track.album == track.album
+            assert parallel_track.genres == track.genres
+
+    def test_tracks_file_chunks_hold_whole_records(self):
+        dirname = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        tracks_file_path = dirname / 'data' / 'raw_tracks_excerpt.csv'
+
+        header, chunks = split_tracks_file(tracks_file_path, 8)
+
+        assert header[0] == 'track_id'
+        assert len(chunks) == 8
+        number_of_tracks = 0
+        for start, end in chunks:
+            tracks, _, _ = read_tracks_chunk(str(tracks_file_path), header, start, end)
+            number_of_tracks += len(tracks)
+        assert number_of_tracks == 2000
+
+    def test_parse_genre_dicts(self):
+        track_genres_raw = "[{'genre_id': '76', 'genre_title': 'Experimental Pop'}, " \
+                           "{'genre_id': '103', 'genre_title': \"Singer's Song\"}]"
+
+        assert parse_genre_dicts(track_genres_raw) == [
+            {'genre_id': '76', 'genre_title': 'Experimental Pop'},
+            {'genre_id': '103', 'genre_title': "Singer's Song"}
+        ]
+        assert parse_genre_dicts('[]') == []
+        with pytest.raises(ValueError):
+            parse_genre_dicts("{'genre_id': '76'}")
+
+    def test_tracks_share_genre_objects(self):
+        reader = create_csv_reader()
+        genres_by_id = {genre.genre_id: genre for genre in reader.dataset_of_genres}
+
+        for track in reader.dataset_of_tracks:
+            for genre in track.genres:
+                assert genre is genres_by_id[genre.genre_id]
+
+    def test_snapshot_round_trip(self, tmp_path):
+        dirname = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        for file_name in ('raw_albums_excerpt.csv', 'raw_tracks_excerpt.csv'):
+            shutil.copy(dirname / 'data' / file_name, tmp_path / file_name)
+
+        reader = TrackCSVReader(use_snapshot=True)
+        reader.read_csv_files(tmp_path, MemoryRepository(reader), False)
+        assert (tmp_path / 'catalogue.snapshot').exists()
+
+        snapshot_reader = TrackCSVReader(use_snapshot=True)
+        assert snapshot_reader.read_snapshot(tmp_path)
+        assert snapshot_reader.dataset_of_tracks == reader.dataset_of_tracks
+        assert snapshot_reader.dataset_of_albums == reader.dataset_of_albums
+        assert snapshot_reader.dataset_of_artists == reader.dataset_of_artists
+        assert snapshot_reader.dataset_of_genres == reader.dataset_of_genres
+
+        track = snapshot_reader.dataset_of_tracks[1]
+        assert track.title == 'Electric Ave'
+        assert track.artist.full_name == 'AWOL'
+        assert track.album.release_year == 2009
+        assert track.track_duration == 237
+        assert [genre.name for genre in track.genres] == ['Hip-Hop']
+
+    def test_snapshot_is_ignored_when_csv_changes(self, tmp_path):
+        dirname = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        for file_name in ('raw_albums_excerpt.csv', 'raw_tracks_excerpt.csv'):
+            shutil.copy(dirname / 'data' / file_name, tmp_path / file_name)
+
+        reader = TrackCSVReader(use_snapshot=True)
+        reader.read_csv_files(tmp_path, MemoryRepository(reader), False)
+        with open(tmp_path / 'raw_tracks_excerpt.csv', 'a') as track_csv:
+            track_csv.write('\n')
+
+        assert not TrackCSVReader(use_snapshot=True).read_snapshot(tmp_path)
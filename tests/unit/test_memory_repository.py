@@ -1,7 +1,12 @@
 import pytest
 
-from music.adapters.repository import RepositoryException
+from music.adapters.csvdatareader import TrackCSVReader
+from music.adapters.memory_repository import MemoryRepository
+from music.adapters.repository import RepositoryException, ALPHABET
 from music.domainmodel.track import Track, User, make_comment, Review
+from music.domainmodel.album import Album
+from music.domainmodel.artist import Artist
+from music.domainmodel.genre import Genre
 from music.authentication.services import AuthenticationException
 from music.tracks import services as news_services
 from music.authentication import services as auth_services
@@ -65,6 +70,16 @@ def test_repository_can_retrieve_user_count(in_memory_repo):
     assert in_memory_repo.get_number_of_users() == 2
 
 
+def test_repository_assigns_user_ids(in_memory_repo):
+    user1 = User(None, 'fmercury', 'abcd1A23')
+    user2 = User(None, 'bmercury', 'abcd1A23')
+    in_memory_repo.add_user(User(5, 'jdeacon', 'abcd1A23'))
+    in_memory_repo.add_user(user1)
+    in_memory_repo.add_user(user2)
+
+    assert (user1.user_id, user2.user_id) == (6, 7)
+
+
 def test_repository_can_add_track(in_memory_repo):
     track = Track(1, 'new track')
 
@@ -82,6 +97,27 @@ def test_repository_can_get_track_by_id(in_memory_repo):
     assert find_track.title == 'new track'
 
 
+def test_repository_can_get_entities_by_id_after_adding(in_memory_repo):
+    artist = Artist(3, 'new artist')
+    album = Album(3, 'new album')
+    genre = Genre(3000, 'new genre')
+    in_memory_repo.add_artist(artist)
+    in_memory_repo.add_album(album)
+    in_memory_repo.add_genre(genre)
+
+    assert in_memory_repo.get_artist_by_id('3') is artist
+    assert in_memory_repo.get_album_by_id(3) is album
+    assert in_memory_repo.get_genre_by_id(3000) is genre
+
+
+def test_repository_does_not_add_a_track_twice(in_memory_repo):
+    number_of_tracks = in_memory_repo.get_number_of_tracks()
+
+    in_memory_repo.add_track(in_memory_repo.get_track_by_id(3))
+
+    assert in_memory_repo.get_number_of_tracks() == number_of_tracks
+
+
 def test_repository_does_not_retrieve_a_non_existent_track(in_memory_repo):
     track = in_memory_repo.get_track_by_id(1)
     assert track is None
@@ -128,3 +164,190 @@ def test_repository_can_retrieve_comments(in_memory_repo):
 
     assert len(in_memory_repo.get_reviews()) == 2
 
+
+def test_repository_can_get_tracks_for_album(in_memory_repo):
+    tracks = in_memory_repo.get_tracks_for_album(1)
+
+    assert [track.title for track in tracks] == ['Electric Ave', 'Food', 'Street Music', 'This World']
+
+
+def test_repository_keeps_tracks_for_artist_sorted_after_adding(in_memory_repo):
+    track = Track(1, 'Aardvark')
+    track.artist = in_memory_repo.get_artist_by_id(1)
+    in_memory_repo.add_track(track)
+
+    tracks = in_memory_repo.get_tracks_for_artist(1)
+
+    assert tracks[0] is track
+    assert len(tracks) == 5
+
+
+def test_repository_indexes_a_catalogue_like_entities_added_one_at_a_time(in_memory_repo):
+    repo = MemoryRepository(TrackCSVReader())
+    for artist in in_memory_repo.get_artists():
+        repo.add_artist(artist)
+    for album in in_memory_repo.get_albums():
+        repo.add_album(album)
+    for track in in_memory_repo.get_tracks():
+        repo.add_track(track)
+
+    for letter in ALPHABET:
+        assert repo.get_tracks_by_letter(letter) == in_memory_repo.get_tracks_by_letter(letter)
+        assert repo.get_artists_by_letter(letter) == in_memory_repo.get_artists_by_letter(letter)
+        assert repo.get_albums_by_letter(letter) == in_memory_repo.get_albums_by_letter(letter)
+    assert repo.get_tracks_for_genre(1) == in_memory_repo.get_tracks_for_genre(1)
+    assert repo.search_tracks('electric') == in_memory_repo.search_tracks('electric')
+    assert repo.get_name_suggestions('s') == in_memory_repo.get_name_suggestions('s')
+
+
+def test_repository_can_get_tracks_for_genre(in_memory_repo):
+    tracks = in_memory_repo.get_tracks_for_genre(1)
+
+    assert len(tracks) == 116
+    assert tracks == sorted(tracks, key=lambda x: x.title)
+
+
+def test_repository_track_listings_do_not_change_its_indexes(in_memory_repo):
+    artist_tracks = list(in_memory_repo.get_tracks_for_artist(1))
+    in_memory_repo.get_tracks_for_genre(1).clear()
+    in_memory_repo.get_tracks_for_artist(1).reverse()
+    in_memory_repo.get_tracks_for_album(1).append(None)
+
+    assert len(in_memory_repo.get_tracks_for_genre(1)) == 116
+    assert in_memory_repo.get_tracks_for_artist(1) == artist_tracks
+    assert None not in in_memory_repo.get_tracks_for_album(1)
+
+
+def test_repository_can_page_through_tracks_by_letter(in_memory_repo):
+    pages = []
+    page = in_memory_repo.get_tracks_page('S', limit=45)
+    while len(page) > 0:
+        pages.append(page)
+        page = in_memory_repo.get_tracks_page('S', page[-1].title, 45, page[-1].track_id)
+
+    assert [len(page) for page in pages[:-1]] == [45] * (len(pages) - 1)
+    assert [track for page in pages for track in page] == in_memory_repo.get_tracks_by_letter('S')
+
+
+def test_repository_pages_past_tracks_with_the_same_title(in_memory_repo):
+    in_memory_repo.add_track(Track(1, 'Food'))
+    food = [track for track in in_memory_repo.get_tracks_by_letter('F') if track.title == 'Food']
+
+    assert in_memory_repo.get_tracks_page('F', 'Food', 1, food[0].track_id) == [food[1]]
+    assert in_memory_repo.get_tracks_page('F', 'Food', 1)[0].title > 'Food'
+
+
+def test_repository_can_search_tracks(in_memory_repo):
+    tracks = in_memory_repo.search_tracks('awol')
+
+    assert sorted(track.title for track in tracks) == ['Electric Ave', 'Food', 'Street Music', 'This World']
+    # Every word has to match, in any of the fields.
+    assert [track.title for track in in_memory_repo.search_tracks('AWOL street')] == ['Street Music']
+    assert in_memory_repo.search_tracks('awol xyzzy') == []
+
+
+def test_repository_ranks_title_matches_first(in_memory_repo):
+    tracks = in_memory_repo.search_tracks('love', 3)
+
+    assert all('love' in track.title.lower() for track in tracks)
+    assert len(in_memory_repo.search_tracks('love', 3)) == 3
+
+
+def test_repository_can_search_tracks_after_adding(in_memory_repo):
+    track = Track(1, 'Zyzzyva Blues')
+    track.add_genre(Genre(1, 'Blues'))
+    in_memory_repo.add_track(track)
+
+    assert in_memory_repo.search_tracks('zyzzyva blues') == [track]
+
+
+def test_repository_can_suggest_names_by_prefix(in_memory_repo):
+    suggestions = in_memory_repo.get_name_suggestions('aw', 3)
+
+    assert suggestions['artists'] == [(1, 'AWOL')]
+    assert [name for _, name in suggestions['albums']] == sorted(name for _, name in suggestions['albums'])
+    assert all(name.lower().startswith('aw') for _, name in suggestions['tracks'] + suggestions['albums'])
+    assert len(in_memory_repo.get_name_suggestions('s', 3)['tracks']) == 3
+
+
+def test_repository_suggests_names_added_later(in_memory_repo):
+    in_memory_repo.add_track(Track(1, 'Awoken'))
+    in_memory_repo.add_artist(Artist(3000, 'Awkward Silence'))
+
+    suggestions = in_memory_repo.get_name_suggestions('AW', 10)
+
+    assert (1, 'Awoken') in suggestions['tracks']
+    assert [name for _, name in suggestions['artists']] == ['Awkward Silence', 'AWOL']
+
+
+def test_repository_suggests_names_in_order_after_many_additions(in_memory_repo):
+    for artist_id in range(3000, 3300):
+        in_memory_repo.add_artist(Artist(artist_id, f'Awe {(artist_id * 7919) % 1000:03}'))
+
+    suggestions = in_memory_repo.get_name_suggestions('aw', 400)['artists']
+
+    assert len(suggestions) == 301
+    assert suggestions == sorted(suggestions, key=lambda entry: (entry[1].lower(), entry[0]))
+    assert in_memory_repo.get_name_suggestions('awe 000', 3)['artists'] == [(3000, 'Awe 000')]
+
+
+def test_repository_fuzzy_search_tolerates_misspellings(in_memory_repo):
+    assert in_memory_repo.fuzzy_search('glas candi')['artists'] == [(147, 'Glass Candy')]
+    assert in_memory_repo.fuzzy_search('electrik avenue', 1)['tracks'] == [(3, 'Electric Ave')]
+    assert in_memory_repo.fuzzy_search('xq') == {'tracks': [], 'artists': [], 'albums': []}
+
+
+def test_repository_fuzzy_search_finds_names_added_later(in_memory_repo):
+    in_memory_repo.add_album(Album(5000, 'Zyzzyva Sessions'))
+
+    assert in_memory_repo.fuzzy_search('zyzyva sesions')['albums'] == [(5000, 'Zyzzyva Sessions')]
+
+
+def test_repository_can_get_similar_tracks_by_genre(in_memory_repo):
+    # Food, Electric Ave and This World are all Hip-Hop only, so they are as similar as can be.
+    similar = in_memory_repo.get_similar_tracks(2, 2)
+
+    assert [track.track_id for track in similar] == [3, 5]
+
+
+def test_repository_ranks_similar_tracks_by_cosine_of_genres(in_memory_repo):
+    genres = [Genre(9001, 'Dub'), Genre(9002, 'Dubstep'), Genre(9003, 'Grime')]
+    genre_ids_of_track = {90001: [0, 1], 90002: [0, 1, 2], 90003: [0], 90004: [2]}
+    for track_id, positions in genre_ids_of_track.items():
+        track = Track(track_id, f'Track {track_id}')
+        for position in positions:
+            track.add_genre(genres[position])
+        in_memory_repo.add_track(track)
+
+    # 2 of 3 genres shared scores 2 / sqrt(2 * 3), above 1 / sqrt(2 * 1) for 1 of 1.
+    assert [track.track_id for track in in_memory_repo.get_similar_tracks(90001)] == [90002, 90003]
+    assert [track.track_id for track in in_memory_repo.get_similar_tracks(90004)] == [90002]
+    assert in_memory_repo.get_similar_tracks(1) == []
+
+
+def test_repository_counts_co_reviewed_tracks(in_memory_repo):
+    reviews_by_user = {'ann': [2, 3, 5], 'bob': [2, 3], 'cat': [2, 10, 2]}
+    for user_name, track_ids in reviews_by_user.items():
+        user = User(None, user_name, 'abcd1A23')
+        in_memory_repo.add_user(user)
+        for track_id in track_ids:
+            in_memory_repo.add_review(make_comment('ok', user, in_memory_repo.get_track_by_id(track_id), 3))
+
+    # Two users reviewed both 2 and 3; cat's second review of 2 doesn't count again.
+    assert [track.track_id for track in in_memory_repo.get_co_reviewed_tracks(2)] == [3, 5, 10]
+    assert [track.track_id for track in in_memory_repo.get_co_reviewed_tracks(2, 1)] == [3]
+    assert [track.track_id for track in in_memory_repo.get_co_reviewed_tracks(10)] == [2]
+    assert in_memory_repo.get_co_reviewed_tracks(20) == []
+
+
+def test_repository_changes_leaderboard_version_with_reviews_and_tracks(in_memory_repo):
+    user = User(None, 'fmercury', 'abcd1A23')
+    in_memory_repo.add_user(user)
+    version = in_memory_repo.get_leaderboard_version()
+
+    in_memory_repo.add_review(make_comment('great track', user, in_memory_repo.get_track_by_id(3), 4))
+    assert in_memory_repo.get_leaderboard_version() != version
+
+    version = in_memory_repo.get_leaderboard_version()
+    in_memory_repo.add_track(Track(90001, 'Brand New'))
+    assert in_memory_repo.get_leaderboard_version() != version
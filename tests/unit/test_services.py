@@ -1,12 +1,20 @@
+import threading
+import time
+
 import pytest
 
+from music.adapters.cache import LocalCache, SqliteCache, make_cache
 from music.authentication.services import AuthenticationException
+from music.authentication import password_hasher
+from music.authentication.password_hasher import PasswordHasher, HasherBusyException
 from music.authentication import services as auth_services
 from music.tracks import services as tracks_services
 from music.tracks.services import NonExistentTrackException
 from music.utilities import services as utility_services
 from music.albums import services as albums_services
 from music.artists import services as artists_services
+from music.search import services as search_services
+from music.domainmodel.artist import Artist
 
 
 def test_can_add_user(in_memory_repo):
@@ -69,6 +77,53 @@ def test_authentication_with_invalid_credentials(in_memory_repo):
         auth_services.authenticate_user(new_user_name, '0987654321', in_memory_repo)
 
 
+def test_can_add_and_authenticate_user_with_a_password_hasher(in_memory_repo):
+    hasher = PasswordHasher(workers=1, max_queued=1, iterations=1000)
+
+    auth_services.add_user('pmccartney', 'abcd1A23', in_memory_repo, hasher)
+
+    # The hash is made with the hasher's work factor.
+    assert auth_services.get_user('pmccartney', in_memory_repo)['password'].startswith('pbkdf2:sha256:1000$')
+    auth_services.authenticate_user('pmccartney', 'abcd1A23', in_memory_repo, hasher)
+    with pytest.raises(auth_services.AuthenticationException):
+        auth_services.authenticate_user('pmccartney', '0987654321', in_memory_repo, hasher)
+    assert hasher.metrics()['completed'] == 3
+    hasher.shutdown()
+
+
+def test_password_hasher_turns_passwords_away_when_its_queue_is_full(monkeypatch):
+    hasher = PasswordHasher(workers=1, max_queued=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_check(password_hash, password):
+        started.set()
+        release.wait()
+        return True
+
+    monkeypatch.setattr(password_hasher, 'check_password_hash', slow_check)
+    checks = [threading.Thread(target=hasher.check, args=('hash', 'password')) for _ in range(2)]
+    checks[0].start()
+    started.wait()
+    checks[1].start()
+    while hasher.metrics()['queued'] == 0:
+        time.sleep(0.01)
+
+    # One password is being checked and one is waiting, which is as many as there may be.
+    with pytest.raises(HasherBusyException):
+        hasher.check('hash', 'password')
+    assert hasher.metrics() == {'workers': 1, 'max_queued': 1, 'queued': 1, 'running': 1, 'peak_queued': 1,
+                                'completed': 0, 'rejected': 1}
+
+    release.set()
+    for check in checks:
+        check.join()
+    metrics = hasher.metrics()
+    assert (metrics['queued'], metrics['running'], metrics['completed']) == (0, 0, 2)
+    assert hasher.check('hash', 'password')
+    hasher.shutdown()
+
+
 def test_can_add_review(in_memory_repo):
     track_id = 3
     tracks_services.get_track_by_id(in_memory_repo, track_id)
@@ -205,6 +260,104 @@ def test_get_last_letter_in_alphabet(in_memory_repo):
     assert list(alphabet_dict.keys())[-1] == 'Other'
 
 
+def test_get_page_of_tracks_by_letter(in_memory_repo):
+    tracks, letter_counts = tracks_services.get_tracks_page_by_letter(in_memory_repo, 'S', 45, 45)
+
+    assert list(letter_counts.keys())[0] == 'A'
+    assert sum(letter_counts.values()) == 2000
+    assert len(tracks) == min(45, letter_counts['S'] - 45)
+    all_tracks_under_s = sorted([track for track in in_memory_repo.get_tracks() if track.title[0].upper() == 'S'],
+                                key=lambda x: x.title)
+    assert tracks == all_tracks_under_s[45:90]
+
+
+def test_get_next_page_of_tracks_by_letter_after_the_last_track_shown(in_memory_repo):
+    first_page, _ = tracks_services.get_tracks_page_by_letter(in_memory_repo, 'S', 0, 45)
+    last_track = first_page[-1]
+
+    next_page, _ = tracks_services.get_tracks_page_by_letter(in_memory_repo, 'S', 45, 45, last_track.title,
+                                                             last_track.track_id)
+
+    assert first_page + next_page == in_memory_repo.get_tracks_by_letter('S', 0, 90)
+
+
+def test_get_page_of_artists_and_albums_by_letter(in_memory_repo):
+    artists, artist_letter_counts = artists_services.get_artists_page_by_letter(in_memory_repo, 'A', 0, 45)
+    albums, album_letter_counts = albums_services.get_albums_page_by_letter(in_memory_repo, 'Other', 0, 45)
+
+    assert artists[0].full_name == 'AWOL'
+    assert sum(artist_letter_counts.values()) == 263
+    assert sum(album_letter_counts.values()) == 427
+    assert all(not album.title[0].isalpha() for album in albums)
+
+
+def test_letter_counts_are_shared_through_the_cache(in_memory_repo, tmp_path, monkeypatch):
+    # Two caches on the same file stand for the caches of two worker processes.
+    first_worker_cache, second_worker_cache = SqliteCache(tmp_path / 'cache.db'), SqliteCache(tmp_path / 'cache.db')
+    _, letter_counts = tracks_services.get_tracks_page_by_letter(in_memory_repo, 'S', 0, 45, cache=first_worker_cache)
+
+    monkeypatch.setattr(in_memory_repo, 'get_track_letter_counts', lambda: pytest.fail('letter counts not cached'))
+    _, cached_letter_counts = tracks_services.get_tracks_page_by_letter(in_memory_repo, 'S', 0, 45,
+                                                                        cache=second_worker_cache)
+    assert cached_letter_counts == letter_counts
+
+
+def test_cached_letter_counts_change_with_the_artists(in_memory_repo):
+    cache = LocalCache()
+    _, letter_counts = artists_services.get_artists_page_by_letter(in_memory_repo, 'Z', 0, 45, cache=cache)
+
+    in_memory_repo.add_artist(Artist(999999, 'Zzz Test Artist'))
+    _, new_letter_counts = artists_services.get_artists_page_by_letter(in_memory_repo, 'Z', 0, 45, cache=cache)
+    assert new_letter_counts['Z'] == letter_counts['Z'] + 1
+
+
+@pytest.mark.parametrize('make_test_cache', (
+        lambda path: LocalCache(size=2, ttl=60),
+        lambda path: SqliteCache(path / 'cache.db', size=2, ttl=60)))
+def test_cache_backends_keep_up_to_size_values(tmp_path, make_test_cache):
+    cache = make_test_cache(tmp_path)
+    cache.set('a', {'A': 1})
+    cache.set('b', [2])
+    cache.set('c', 3)
+
+    assert cache.get('c') == 3
+    assert cache.get('b') == [2]
+    assert cache.get('a') is None
+
+    cache.delete('b')
+    assert cache.get('b') is None
+    cache.clear()
+    assert cache.get('c') is None
+
+
+def test_local_cache_drops_the_least_recently_used_value():
+    cache = LocalCache(size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+
+
+@pytest.mark.parametrize('make_test_cache', (
+        lambda path: LocalCache(ttl=0),
+        lambda path: SqliteCache(path / 'cache.db', ttl=0)))
+def test_cache_backends_expire_values(tmp_path, make_test_cache):
+    cache = make_test_cache(tmp_path)
+    cache.set('a', 1)
+    time.sleep(0.01)
+
+    assert cache.get('a') is None
+    assert cache.get_or_set('a', lambda: 2) == 2
+
+
+def test_make_cache_rejects_an_unknown_backend():
+    with pytest.raises(ValueError):
+        make_cache({'CACHE_BACKEND': 'memcached', 'CACHE_SIZE': 1, 'CACHE_TTL': 1})
+
+
 def test_get_reviews_for_track(in_memory_repo):
     track_id = 2
     tracks_services.get_track_by_id(in_memory_repo, track_id)
@@ -245,25 +398,57 @@ def test_get_reviews_for_track_without_reviews(in_memory_repo):
     assert len(track_reviews) == 0
 
 
-def test_popular_reviews(in_memory_repo):
-    track_id = 48
-    tracks_services.get_track_by_id(in_memory_repo, track_id)
+def test_top_tracks_follow_reviews(in_memory_repo):
     user_name = 'fmercury'
-    review_text = 'no longer my favourite track'
-    rating = 2
-
     auth_services.add_user(user_name, 'abcd1A23', in_memory_repo)
-    # Call the service layer to add the review.
-    tracks_services.add_review(track_id, rating, review_text, user_name, in_memory_repo)
 
-    track_id = 134
-    tracks_services.get_track_by_id(in_memory_repo, track_id)
-    review_text = 'my favourite track'
-    rating = 5
+    tracks_services.add_review(134, 5, 'my favourite track', user_name, in_memory_repo)
+    tracks_services.add_review(48, 2, 'not bad', user_name, in_memory_repo)
+    tracks_services.add_review(48, 3, 'growing on me', user_name, in_memory_repo)
 
-    # Call the service layer to add the review.
-    tracks_services.add_review(track_id, rating, review_text, user_name, in_memory_repo)
+    top_tracks = utility_services.get_top_tracks(in_memory_repo, 15)
+
+    assert len(top_tracks) == 15
+    assert [track.track_id for track in top_tracks[:2]] == [48, 134]
+    # The places left over go to unreviewed tracks, in catalogue order.
+    unreviewed = [track for track in in_memory_repo.get_tracks() if track.track_id not in (48, 134)]
+    assert top_tracks[2:] == unreviewed[:13]
+
+
+def test_search_tracks(in_memory_repo):
+    tracks = search_services.search_tracks(in_memory_repo, 'Electric AWOL', 10)
+
+    assert [track.title for track in tracks] == ['Electric Ave']
+    assert search_services.search_tracks(in_memory_repo, '  !? ', 10) == []
+
+
+def test_get_name_suggestions(in_memory_repo):
+    suggestions = search_services.get_name_suggestions(in_memory_repo, 'ele', 5)
+
+    assert suggestions['tracks'][0] == {'id': 3, 'name': 'Electric Ave'}
+    assert all(track['name'].lower().startswith('ele') for track in suggestions['tracks'])
+    assert search_services.get_name_suggestions(in_memory_repo, ' ', 5) == {'tracks': [], 'artists': [], 'albums': []}
+
+
+def test_get_similar_tracks(in_memory_repo):
+    similar = tracks_services.get_similar_tracks(in_memory_repo, 3, 3)
+
+    assert [track.track_id for track in similar] == [2, 5, 134]
+    assert all([genre.name for genre in track.genres] == ['Hip-Hop'] for track in similar)
+
+
+def test_get_co_reviewed_tracks(in_memory_repo):
+    auth_services.add_user('jz', 'abcd1A23', in_memory_repo)
+    tracks_services.add_review(2, 4, 'good', 'jz', in_memory_repo)
+    tracks_services.add_review(10, 5, 'better', 'jz', in_memory_repo)
+
+    co_reviewed = tracks_services.get_co_reviewed_tracks(in_memory_repo, 2)
+
+    assert [track.track_id for track in co_reviewed] == [10]
+
+
+def test_fuzzy_search(in_memory_repo):
+    matches = search_services.fuzzy_search(in_memory_repo, 'awool', 5)
 
-    popular_tracks = utility_services.sort_tracks_by_reviews(in_memory_repo)
-    assert popular_tracks[0].track_id == 48
-    assert popular_tracks[1].track_id == 134
+    assert matches['artists'] == [(1, 'AWOL')]
+    assert search_services.fuzzy_search(in_memory_repo, '', 5) == {'tracks': [], 'artists': [], 'albums': []}
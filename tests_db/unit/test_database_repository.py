@@ -1,35 +1,46 @@
+import gc
+import threading
+import time
+import weakref
 from datetime import date, datetime
 
 import pytest
 import sqlalchemy.exc
+from sqlalchemy import event, create_engine, pool, inspect
+from sqlalchemy.orm import sessionmaker
 
 import music.adapters.repository as repo
-from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.database_repository import SqlAlchemyRepository, pool_options, use_sqlite_wal
 from music.domainmodel.track import User, Review, Track, make_comment
 from music.domainmodel.album import Album
 from music.domainmodel.artist import Artist
 from music.domainmodel.genre import Genre
-from music.adapters.repository import RepositoryException
+from music.adapters.repository import RepositoryException, TRACK_SUMMARY
+from music.adapters.write_behind import WriteBehindQueue
+from music.adapters.orm import create_schema
 
 
 def test_repository_can_add_a_user(session_factory):
     repo = SqlAlchemyRepository(session_factory)
 
-    user = User(2, 'Dave', '123456789')
+    user = User(None, 'Dave', '123456789')
     repo.add_user(user)
 
-    repo.add_user(User(3, 'Martin', '123456789'))
+    repo.add_user(User(None, 'Martin', '123456789'))
 
     user2 = repo.get_user('Dave')
 
     assert user2 == user and user2 is user
+    # The two populated users come first.
+    assert user.user_id == 3
+    assert repo.get_user('Martin').user_id == 4
 
 
 def test_repository_can_retrieve_a_user(session_factory):
     repo = SqlAlchemyRepository(session_factory)
 
     user = repo.get_user('laptop')
-    assert user == User(0, 'laptop', 'Mercury00')
+    assert user == User(1, 'laptop', 'Mercury00')
 
 
 def test_repository_does_not_retrieve_a_non_existent_user(session_factory):
@@ -90,6 +101,185 @@ def test_repository_does_not_retrieve_a_non_existent_track(session_factory):
     assert track is None
 
 
+def test_repository_can_retrieve_tracks_for_artist_album_and_genre(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    tracks_for_artist = repo.get_tracks_for_artist(1)
+    tracks_for_album = repo.get_tracks_for_album(1)
+    tracks_for_genre = repo.get_tracks_for_genre(1)
+
+    assert [track.title for track in tracks_for_artist] == ['Electric Ave', 'Food', 'Street Music', 'This World']
+    assert tracks_for_album == tracks_for_artist
+    assert len(tracks_for_genre) == 116
+    assert [track.title for track in tracks_for_genre][:3] == ['... listening to the sunshine burn the grass', '1', '1913']
+
+
+def test_repository_can_retrieve_tracks_by_letter(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    letter_counts = repo.get_track_letter_counts()
+    tracks = repo.get_tracks_by_letter('S', 45, 45)
+
+    all_tracks_under_s = sorted([track for track in repo.get_tracks() if track.title[0].upper() == 'S'],
+                                key=lambda x: x.title)
+    assert sum(letter_counts.values()) == 2000
+    assert letter_counts['S'] == len(all_tracks_under_s)
+    assert tracks == all_tracks_under_s[45:90]
+    assert sum(repo.get_artist_letter_counts().values()) == 263
+    assert repo.get_albums_by_letter('A', 0, 1)[0].title == 'A Flow of Code'
+
+
+def test_repository_can_page_through_tracks_by_letter(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    for letter in ['S', 'Other']:
+        tracks = []
+        page = repo.get_tracks_page(letter, limit=45)
+        while len(page) > 0:
+            tracks += page
+            page = repo.get_tracks_page(letter, page[-1].title, 45, page[-1].track_id)
+        assert tracks == repo.get_tracks_by_letter(letter)
+
+
+def test_repository_lists_tracks_with_the_same_title_in_the_order_it_pages_them(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    for track_id in (90002, 90001):
+        track = Track(track_id, 'Same Title')
+        track.track_url, track.track_duration = 'http://example.com', 100
+        repo.add_track(track)
+
+    tracks = repo.get_tracks_by_letter('S')
+    same = [track.track_id for track in tracks if track.title == 'Same Title']
+    position = [track.track_id for track in tracks].index(90001)
+
+    assert same == [90001, 90002]
+    assert repo.get_tracks_page('S', 'Same Title', 1, 90001) == tracks[position + 1:position + 2]
+    assert repo.get_tracks_by_letter('S', position, 2) == [tracks[position], tracks[position + 1]]
+
+
+def test_repository_pages_tracks_using_the_title_index(session_factory):
+    session = session_factory()
+    query = 'EXPLAIN QUERY PLAN SELECT * FROM tracks WHERE title >= "S" AND title < "T" ' \
+            'AND (title, track_id) > ("Song", 2) ORDER BY title, track_id LIMIT 45'
+
+    plan = ' '.join(row[-1] for row in session.execute(query))
+
+    assert 'USING INDEX ix_tracks_title_track_id' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_repository_caches_entity_counts(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    assert repo.get_number_of_users() == 2
+    assert repo.get_number_of_artists() == 263
+    assert count_statements(session_factory, lambda: (repo.get_number_of_users(), repo.get_number_of_artists())) == 0
+
+    repo.add_user(User(None, 'Dave', '123456789'))
+    repo.add_artist(Artist(3000, 'New Artist'))
+    repo.add_artist(Artist(3000, 'New Artist'))
+
+    assert repo.get_number_of_users() == 3
+    assert repo.get_number_of_artists() == 264
+
+
+def test_repository_recounts_entities_after_a_rollback(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    assert repo.get_number_of_users() == 2
+
+    # A failed add rolls back, after which the count is taken from the database again.
+    with pytest.raises(sqlalchemy.exc.IntegrityError):
+        repo.add_user(User(None, 'laptop', '123456789'))
+    assert count_statements(session_factory, repo.get_number_of_users) == 1
+    assert repo.get_number_of_users() == 2
+
+
+def test_repository_does_not_outlive_its_use_of_the_session_factory(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    repository = weakref.ref(repo)
+
+    del repo
+    gc.collect()
+    assert repository() is None
+    # Rolling back a session of the factory is no concern of the repository's any more.
+    session = session_factory()
+    session.rollback()
+    session.close()
+
+
+def test_repository_can_search_tracks(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    tracks = repo.search_tracks('awol')
+
+    assert sorted(track.title for track in tracks) == ['Electric Ave', 'Food', 'Street Music', 'This World']
+    assert [track.title for track in repo.search_tracks('AWOL street')] == ['Street Music']
+    assert repo.search_tracks('awol xyzzy') == []
+    assert repo.search_tracks('"') == []
+    assert all('love' in track.title.lower() for track in repo.search_tracks('love', 3))
+
+
+def test_repository_can_search_tracks_after_adding(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    track = Track(1, 'Zyzzyva Blues')
+    track.track_duration = 100
+    track.track_url = 'http://zyzzyva.com'
+    repo.add_track(track)
+
+    assert repo.search_tracks('zyzzyva') == [track]
+    assert repo.search_tracks('shivers') == []
+
+
+def test_schema_is_completed_on_a_database_made_without_the_search_index(session_factory):
+    engine = session_factory.kw['bind']
+    engine.execute('DROP TABLE tracks_search')
+    engine.execute('DROP INDEX ix_tracks_title_track_id')
+    repo = SqlAlchemyRepository(session_factory)
+
+    create_schema(engine)
+    repo.rebuild_search_index()
+
+    assert 'tracks_search' in inspect(engine).get_table_names()
+    assert 'ix_tracks_title_track_id' in [index['name'] for index in inspect(engine).get_indexes('tracks')]
+    assert sorted(track.title for track in repo.search_tracks('awol')) == [
+        'Electric Ave', 'Food', 'Street Music', 'This World']
+
+
+def test_repository_suggests_names_without_querying_the_database(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    assert repo.get_name_suggestions('awo')['artists'] == [(1, 'AWOL')]
+
+    repo.add_artist(Artist(3000, 'Awoken'))
+
+    suggestions = []
+    assert count_statements(session_factory, lambda: suggestions.append(repo.get_name_suggestions('AWO', 3))) == 0
+    assert suggestions[0]['artists'] == [(3000, 'Awoken'), (1, 'AWOL')]
+    assert all(name.lower().startswith('awo') for _, name in suggestions[0]['tracks'])
+
+
+def test_repository_fuzzy_search_tolerates_misspellings(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    assert repo.fuzzy_search('glas candi')['artists'] == [(147, 'Glass Candy')]
+
+    album = Album(5000, 'Zyzzyva Sessions')
+    album.album_url = 'www.album.com'
+    album.album_type = 'Album'
+    repo.add_album(album)
+    assert repo.fuzzy_search('zyzyva sesions')['albums'] == [(5000, 'Zyzzyva Sessions')]
+
+
+def test_repository_can_get_similar_tracks_by_genre(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    similar = repo.get_similar_tracks(2, 2, load=TRACK_SUMMARY)
+    assert [track.track_id for track in similar] == [3, 5]
+
+    # The index is built once; later lookups only fetch the similar tracks.
+    assert count_statements(session_factory, lambda: repo.get_similar_tracks(3, 2)) == 1
+    assert repo.get_similar_tracks(999999) == []
+
+
 def test_repository_can_retrieve_artist_count(session_factory):
     repo = SqlAlchemyRepository(session_factory)
 
@@ -229,6 +419,56 @@ def test_repository_can_add_a_review(session_factory):
     assert review in repo.get_reviews()
 
 
+def test_repository_changes_versions_with_reviews(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    version = repo.get_leaderboard_version()
+    review_version, track_version = repo.get_entity_version(Review), repo.get_entity_version(Track)
+
+    repo.add_review(make_comment('addicting track', repo.get_user('laptop'), repo.get_track_by_id(10), 5))
+
+    assert repo.get_leaderboard_version() != version
+    assert repo.get_entity_version(Review) != review_version
+    assert repo.get_entity_version(Track) == track_version
+
+
+def test_repository_versions_are_shared_through_the_database(session_factory):
+    # Two repositories on one database, as in two worker processes.
+    repo, other_repo = SqlAlchemyRepository(session_factory), SqlAlchemyRepository(session_factory)
+    version = other_repo.get_leaderboard_version()
+
+    repo.add_review(make_comment('addicting track', repo.get_user('laptop'), repo.get_track_by_id(10), 5))
+
+    assert other_repo.get_leaderboard_version() != version
+    assert other_repo.get_leaderboard_version() == repo.get_leaderboard_version()
+    assert other_repo.get_entity_version(Review) == repo.get_entity_version(Review)
+
+
+def test_repository_keeps_co_reviewed_tracks_up_to_date(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    # laptop has reviewed track 3, and nobody else has.
+    assert repo.get_co_reviewed_tracks(3) == []
+
+    user = repo.get_user('laptop')
+    repo.add_review(make_comment('addicting track', user, repo.get_track_by_id(10), 5))
+
+    # Brought up to date with the new review rather than read again, then the co-reviewed tracks are queried.
+    co_reviewed = []
+    assert count_statements(session_factory, lambda: co_reviewed.extend(repo.get_co_reviewed_tracks(3))) == 2
+    assert [track.track_id for track in co_reviewed] == [10]
+    assert [track.track_id for track in SqlAlchemyRepository(session_factory).get_co_reviewed_tracks(10)] == [3]
+
+
+def test_repository_counts_co_reviewed_tracks_stored_by_other_repositories(session_factory):
+    # Two repositories on one database, as in two worker processes.
+    repo, other_repo = SqlAlchemyRepository(session_factory), SqlAlchemyRepository(session_factory)
+    assert other_repo.get_co_reviewed_tracks(3) == []
+
+    repo.add_review(make_comment('addicting track', repo.get_user('laptop'), repo.get_track_by_id(10), 5))
+
+    assert [track.track_id for track in other_repo.get_co_reviewed_tracks(3)] == [10]
+    assert [track.track_id for track in repo.get_co_reviewed_tracks(3)] == [10]
+
+
 def test_repository_does_not_add_a_review_without_a_user(session_factory):
     repo = SqlAlchemyRepository(session_factory)
 
@@ -245,6 +485,53 @@ def test_repository_can_retrieve_comments(session_factory):
     assert len(repo.get_reviews()) == 2
 
 
+def test_repository_can_retrieve_top_tracks(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    user = repo.get_user('notebook')
+    track = repo.get_track_by_id(5)
+    repo.add_review(make_comment('still not a fan', user, track, 2))
+
+    top_tracks = repo.get_top_tracks(3)
+
+    assert [track.track_id for track in top_tracks] == [5, 3, 2]
+
+
+def count_statements(session_factory, action):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = session_factory.kw['bind']
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        action()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return len(statements)
+
+
+def test_repository_loads_track_relationships_in_a_constant_number_of_queries(session_factory):
+    def show_top_tracks(quantity, load):
+        for track in SqlAlchemyRepository(session_factory).get_top_tracks(quantity, load=load):
+            (track.artist.full_name, track.album and track.album.title)
+
+    def show_genre(load):
+        for track in SqlAlchemyRepository(session_factory).get_tracks_for_genre(1, load=load):
+            (track.artist.full_name, [genre.name for genre in track.genres], len(track.reviews))
+
+    # Lazily loading the relationships costs a query for every artist and album not yet in the session.
+    assert count_statements(session_factory, lambda: show_top_tracks(45, ())) > 10
+
+    assert count_statements(session_factory, lambda: show_top_tracks(45, repo.TRACK_SUMMARY)) == 1
+    assert count_statements(session_factory, lambda: show_top_tracks(5, repo.TRACK_SUMMARY)) == 1
+    assert count_statements(session_factory, lambda: show_genre(repo.TRACK_DETAILS)) == 3
+
+    with pytest.raises(ValueError):
+        SqlAlchemyRepository(session_factory).get_top_tracks(5, load=('composer',))
+
+
 def test_can_retrieve_a_track_and_add_a_review_to_it(session_factory):
     repo = SqlAlchemyRepository(session_factory)
 
@@ -261,3 +548,128 @@ def test_can_retrieve_a_track_and_add_a_review_to_it(session_factory):
     assert review in track_fetched.reviews
     assert review in author_fetched.reviews
 
+
+def test_pool_options_from_config():
+    config = {'SQLALCHEMY_POOL_CLASS': 'QueuePool', 'SQLALCHEMY_POOL_SIZE': 3, 'SQLALCHEMY_MAX_OVERFLOW': 2,
+              'SQLALCHEMY_POOL_RECYCLE': 600}
+
+    assert pool_options(config) == {'poolclass': pool.QueuePool, 'pool_size': 3, 'max_overflow': 2, 'pool_recycle': 600}
+
+    config['SQLALCHEMY_POOL_CLASS'] = 'NullPool'
+    assert pool_options(config) == {'poolclass': pool.NullPool, 'pool_recycle': 600}
+
+    config['SQLALCHEMY_POOL_CLASS'] = 'create_engine'
+    with pytest.raises(ValueError):
+        pool_options(config)
+
+
+def test_sqlite_connections_use_wal(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "wal.db"}')
+    use_sqlite_wal(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute('PRAGMA journal_mode').scalar() == 'wal'
+        # 1 is NORMAL
+        assert connection.execute('PRAGMA synchronous').scalar() == 1
+
+
+def test_write_behind_queue_groups_items_in_order():
+    batches = []
+    first_write_started, first_write_may_finish = threading.Event(), threading.Event()
+
+    def write_batch(batch):
+        batches.append(list(batch))
+        first_write_started.set()
+        first_write_may_finish.wait()
+
+    write_queue = WriteBehindQueue(write_batch, batch_size=2)
+    write_queue.put(1)
+    first_write_started.wait()
+    # These are put while the first batch is being written, so go into the next batches together.
+    for item in (2, 3, 4):
+        write_queue.put(item)
+    first_write_may_finish.set()
+
+    assert write_queue.flush(timeout=5)
+    assert batches == [[1], [2, 3], [4]]
+    write_queue.close()
+    with pytest.raises(RuntimeError):
+        write_queue.put(5)
+
+
+def test_write_behind_queue_writes_the_rest_of_a_failed_batch():
+    written, failed = [], []
+
+    def write_batch(batch):
+        if 'bad' in batch:
+            raise ValueError('bad item')
+        written.extend(batch)
+
+    write_queue = WriteBehindQueue(write_batch, on_error=lambda item, e: failed.append(item))
+    for item in ('a', 'bad', 'b'):
+        write_queue.put(item)
+    write_queue.close()
+
+    assert written == ['a', 'b']
+    assert failed == ['bad']
+
+
+def test_repository_shows_queued_reviews_until_they_are_committed(database_engine):
+    session_factory = sessionmaker(autocommit=False, autoflush=True, bind=database_engine)
+    repo = SqlAlchemyRepository(session_factory, write_behind=True)
+    number_of_reviews = len(repo.get_reviews())
+
+    # Hold the database's write lock, so that the queued reviews can't be committed yet.
+    blocker = database_engine.raw_connection()
+    blocker.cursor().execute('BEGIN IMMEDIATE')
+    try:
+        repo.add_review(make_comment('first', repo.get_user('laptop'), repo.get_track_by_id(10), 5))
+        repo.add_review(make_comment('second', repo.get_user('laptop'), repo.get_track_by_id(10), 4))
+
+        repo.reset_session()
+        assert [review.review_text for review in repo.get_track_by_id(10).reviews] == ['first', 'second']
+        assert [review.review_text for review in repo.get_user('laptop').reviews][-2:] == ['first', 'second']
+        assert len(repo.get_reviews()) == number_of_reviews + 2
+        # The leaderboard is read from the stored reviews, so neither it nor its version changes until they are
+        # committed.
+        version, top_tracks = repo.get_leaderboard_version(), repo.get_top_tracks(3)
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+    repo.close()
+    stored = SqlAlchemyRepository(session_factory)
+    assert [review.review_text for review in stored.get_track_by_id(10).reviews] == ['first', 'second']
+    assert len(stored.get_reviews()) == number_of_reviews + 2
+    assert stored.get_leaderboard_version() != version
+    assert stored.get_top_tracks(3) != top_tracks
+
+
+def test_repository_counts_queued_reviews_in_co_reviewed_tracks_once_committed(database_engine):
+    session_factory = sessionmaker(autocommit=False, autoflush=True, bind=database_engine)
+    repo = SqlAlchemyRepository(session_factory, write_behind=True)
+
+    # Hold the database's write lock for a moment, so that the review is still queued when the tracks are asked for.
+    locked = threading.Event()
+
+    def hold_write_lock():
+        blocker = database_engine.raw_connection()
+        blocker.cursor().execute('BEGIN IMMEDIATE')
+        locked.set()
+        time.sleep(0.2)
+        blocker.rollback()
+        blocker.close()
+
+    holder = threading.Thread(target=hold_write_lock)
+    holder.start()
+    locked.wait()
+    try:
+        repo.add_review(make_comment('addicting track', repo.get_user('laptop'), repo.get_track_by_id(10), 5))
+        assert repo.get_co_reviewed_tracks(3) == []
+    finally:
+        holder.join()
+
+    repo.flush_reviews()
+    # laptop has reviewed track 3 as well.
+    assert [track.track_id for track in repo.get_co_reviewed_tracks(3)] == [10]
+    repo.close()
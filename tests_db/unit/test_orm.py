@@ -244,3 +244,31 @@ def test_save_reviewed_track(empty_session):
     rows = list(empty_session.execute('SELECT user_id, track_id, review_text FROM reviews'))
     assert rows == [(user_key, track_key, review_text)]
 
+
+def test_hot_lookups_use_indexes(empty_session):
+    # The queries SQLAlchemy runs to load each relationship, with the parent's key filled in, and the index each
+    # should be answered from.
+    track, user, genre = make_track(), make_user(), make_genre()
+    lookups = [
+        (Track, make_artist(), Artist._Artist__tracks, 'ix_tracks_artist_id'),
+        (Track, make_album(), Album._Album__tracks, 'ix_tracks_album_id'),
+        (Review, track, Track._Track__reviews, 'ix_reviews_track_id'),
+        (Review, user, User._User__reviews, 'ix_reviews_user_id'),
+        (Genre, track, Track._Track__genres, 'ix_track_genres_track_id_genre_id'),
+        (Track, genre, Genre._Genre__tracks, 'ix_track_genres_genre_id'),
+    ]
+    for entity, parent, relationship, index_name in lookups:
+        statement = empty_session.query(entity).with_parent(parent, relationship).statement
+        query = str(statement.compile(empty_session.bind, compile_kwargs={'literal_binds': True}))
+        plan = ' '.join(row[-1] for row in empty_session.execute('EXPLAIN QUERY PLAN ' + query))
+        assert 'INDEX ' + index_name in plan, (query, plan)
+
+
+def test_saving_of_duplicate_track_genre(empty_session):
+    track_key = insert_track(empty_session)
+    empty_session.execute('INSERT INTO genres (genre_id, name) VALUES (1, "Pop")')
+    stmt = 'INSERT INTO track_genres (genre_id, track_id) VALUES (:genre_id, :track_id)'
+    empty_session.execute(stmt, {'track_id': track_key, 'genre_id': 1})
+
+    with pytest.raises(IntegrityError):
+        empty_session.execute(stmt, {'track_id': track_key, 'genre_id': 1})
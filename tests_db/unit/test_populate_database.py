@@ -7,14 +7,17 @@ def test_database_populate_inspect_table_names(database_engine):
 
     # Get table information
     inspector = inspect(database_engine)
-    assert inspector.get_table_names() == ['albums', 'artists', 'genres', 'reviews', 'track_genres', 'tracks', 'users']
+    assert inspector.get_table_names() == ['albums', 'artists', 'genres', 'reviews', 'track_genres', 'tracks',
+                                           'tracks_search', 'tracks_search_config', 'tracks_search_content',
+                                           'tracks_search_data', 'tracks_search_docsize', 'tracks_search_idx', 'users',
+                                           'versions']
 
 
 def test_database_populate_select_all_users(database_engine):
 
     # Get table information
     inspector = inspect(database_engine)
-    name_of_users_table = inspector.get_table_names()[6]
+    name_of_users_table = inspector.get_table_names()[12]
 
     with database_engine.connect() as connection:
         # query for records in table users
@@ -43,7 +46,7 @@ def test_database_populate_select_all_reviews(database_engine):
         for row in result:
             all_reviews.append((row['id'], row['track_id'], row['user_id'], row['review_text'], row['rating'], row['reviewer']))
 
-        assert all_reviews == [(1, 3, 0, 'my favourite track', 5, 'laptop'), (2, 5, 1, 'i hate this track', 1, 'notebook')]
+        assert all_reviews == [(1, 3, 1, 'my favourite track', 5, 'laptop'), (2, 5, 2, 'i hate this track', 1, 'notebook')]
 
 
 def test_database_populate_select_all_tracks(database_engine):
@@ -129,3 +132,19 @@ def test_database_populate_select_all_genres(database_engine):
 
         assert all_genres[0] == (1, 'Avant-Garde')
 
+
+def test_database_populate_select_all_track_genres(database_engine):
+
+    with database_engine.connect() as connection:
+        # query for records in table track_genres
+        select_statement = select([metadata.tables['track_genres']])
+        result = connection.execute(select_statement)
+
+        all_track_genres = []
+        for row in result:
+            all_track_genres.append((row['track_id'], row['genre_id']))
+
+        nr_track_genres = len(all_track_genres)
+        assert nr_track_genres == 2268
+
+        assert all_track_genres[0] == (2, 21)